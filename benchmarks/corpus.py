@@ -0,0 +1,66 @@
+#Generates synthetic HTML pages that stress the hot paths of parsing and layout
+
+import random
+
+WORDS = [
+    'the', 'of', 'and', 'browser', 'layout', 'galileo', 'parser', 'render', 'a', 'in',
+    'to', 'is', 'page', 'network', 'canvas', 'font', 'measure', 'text', 'line', 'scroll'
+]
+
+def words(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+#Elements nested inside each other, depth levels deep, repeated count times
+def deep_nesting(depth=400, count=20, seed=0):
+    rng = random.Random(seed)
+    tags = ['div', 'span', 'b', 'i', 'small', 'big']
+    parts = ['<html><body>']
+    for _ in range(count):
+        opened = [rng.choice(tags) for _ in range(depth)]
+        for tag in opened:
+            parts.append('<{}>{} '.format(tag, rng.choice(WORDS)))
+        for tag in reversed(opened):
+            parts.append('</{}>'.format(tag))
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+#Few tags and a lot of text
+def long_paragraphs(paragraphs=200, words_per_paragraph=1000, seed=0):
+    rng = random.Random(seed)
+    parts = ['<html><body>']
+    for _ in range(paragraphs):
+        parts.append('<p>{}</p>'.format(words(rng, words_per_paragraph)))
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+#Lots of tags with attributes around one or two words each
+def many_small_tags(count=50000, seed=0):
+    rng = random.Random(seed)
+    tags = ['b', 'i', 'span', 'a', 'small', 'big', 'sup']
+    parts = ['<html><head><title>Small tags</title></head><body><p>']
+    for i in range(count):
+        tag = rng.choice(tags)
+        parts.append('<{} class="c{}" id="e{}">{}</{}> '.format(tag, i % 10, i, words(rng, rng.randint(1, 2)), tag))
+        if i % 50 == 49:
+            parts.append('</p><br><p>')
+    parts.append('</p></body></html>')
+    return ''.join(parts)
+
+#A big table with text in every cell
+def large_table(rows=2000, columns=8, seed=0):
+    rng = random.Random(seed)
+    parts = ['<html><body><table>']
+    for _ in range(rows):
+        parts.append('<tr>')
+        for _ in range(columns):
+            parts.append('<td>{}</td>'.format(words(rng, 3)))
+        parts.append('</tr>')
+    parts.append('</table></body></html>')
+    return ''.join(parts)
+
+CORPORA = {
+    'deep_nesting': deep_nesting,
+    'long_paragraphs': long_paragraphs,
+    'many_small_tags': many_small_tags,
+    'large_table': large_table,
+}
@@ -0,0 +1,55 @@
+#Compares the memory used by the columnar DisplayList with a list of (x, y, word, font) tuples
+#Run from the repository root with: python -m benchmarks.displaylist_memory [number of words]
+
+import random
+import sys
+import time
+import tracemalloc
+from src import displaylist as displaylist
+from src import fonts as fonts
+
+#Generates n laid out words on lines of 12 words using 4 fonts
+def generate(n, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ['w{}'.format(i) for i in range(5000)]
+    keys = [(12, 'normal', 'roman'), (12, 'bold', 'roman'), (12, 'normal', 'italic'), (17, 'normal', 'roman')]
+    for i in range(n):
+        yield 13 + (i % 12) * 60.5, 18 + (i // 12) * 18.75, rng.choice(vocabulary), keys[i % 7 % 4]
+
+#Measures the time and the memory taken to build the structure with the function
+def measure(build, entries):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(entries)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current, peak
+
+def build_tuples(entries):
+    font_objects = {} #Stands in for the tkinter fonts the tuples used to reference
+    display_list = []
+    for x, y, word, key in entries:
+        font = font_objects.setdefault(key, object())
+        display_list.append((x, y, word, font))
+    return display_list
+
+def build_columns(entries):
+    font_cache = fonts.FontCache()
+    display_list = displaylist.DisplayList(font_cache)
+    for x, y, word, key in entries:
+        display_list.append(x, y, word, font_cache.get_font_id(*key))
+    return display_list
+
+def main(n):
+    entries = list(generate(n))
+    #The words are copied so that the tuple list doesn't share the strings of the vocabulary, like words split from the page
+    entries = [(x, y, ''.join(word), key) for x, y, word, key in entries]
+    print('{} words'.format(n))
+    for name, build in [('tuple list', build_tuples), ('DisplayList', build_columns)]:
+        result, elapsed, current, peak = measure(build, iter(entries))
+        print('{:12} {:8.3f}s  {:8.1f} MB retained  {:8.1f} MB peak'.format(name, elapsed, current / 2**20, peak / 2**20))
+        del result
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
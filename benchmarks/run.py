@@ -0,0 +1,81 @@
+#Benchmarks parsing, layout and display list building on synthetic pages, without a display
+#Run from the repository root with: python -m benchmarks.run [--repeat N] [--corpus NAME]
+
+import argparse
+import gc
+import time
+import tracemalloc
+from src import htmlparser as htmlp
+from src import fonts as fonts
+from src import css as css
+from src import view as view
+from benchmarks import corpus as corpus
+
+#Runs the function repeat times and returns the result of the last run, the best time and the peak memory of a traced run
+def measure(function, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    result = None
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+#Benchmarks one page and returns the numbers as a dictionary
+def run_page(name, html, repeat=3, width=800, height=600):
+    nodes, parse_time, parse_peak = measure(lambda: htmlp.HTMLParser(html).parse(), repeat)
+    _, style_time, style_peak = measure(lambda: css.style_tree(nodes), repeat)
+    font_cache = fonts.FontCache(fonts.HeadlessMetrics())
+    #The first layout fills the measurement cache, the measured runs show layout with a warm cache like on a relayout
+    view.Layout(nodes, width, height, font_cache)
+    layout, layout_time, layout_peak = measure(lambda: view.Layout(nodes, width, height, font_cache), repeat)
+    display_list = layout.display_list
+    return {
+        'corpus': name,
+        'bytes': len(html),
+        'nodes': count_nodes(nodes),
+        'parse_s': parse_time,
+        'parse_mb_s': len(html) / parse_time / 2**20,
+        'parse_peak_mb': parse_peak / 2**20,
+        'style_s': style_time,
+        'style_peak_mb': style_peak / 2**20,
+        'layout_s': layout_time,
+        'words_s': len(display_list) / layout_time if layout_time else 0.0,
+        'layout_peak_mb': layout_peak / 2**20,
+        'display_list_words': len(display_list),
+        'display_list_mb': display_list.nbytes() / 2**20,
+        'measure_hit_rate': font_cache.stats()['hit_rate'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parsing and layout on synthetic pages')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the best time is reported')
+    parser.add_argument('--corpus', action='append', choices=sorted(corpus.CORPORA), help='only run these corpora')
+    args = parser.parse_args()
+    print('{:16} {:>8} {:>8} {:>9} {:>9} {:>8} {:>10} {:>9} {:>10} {:>9}'.format(
+        'corpus', 'KB', 'nodes', 'parse MB/s', 'parse MB', 'style ms', 'words/s', 'layout MB', 'DL words', 'DL MB'))
+    for name in args.corpus or sorted(corpus.CORPORA):
+        result = run_page(name, corpus.CORPORA[name](), args.repeat)
+        print('{:16} {:8.0f} {:8d} {:10.1f} {:9.1f} {:8.1f} {:10.0f} {:9.1f} {:10d} {:9.2f}'.format(
+            name, result['bytes'] / 1024, result['nodes'], result['parse_mb_s'], result['parse_peak_mb'], result['style_s'] * 1000,
+            result['words_s'], result['layout_peak_mb'], result['display_list_words'], result['display_list_mb']))
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,18 @@
-#Main file - starts the app
+#Main file - starts the app, or loads a list of URLs without a window with --batch
 
 if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Galileo web browser')
+    parser.add_argument('--batch', metavar='FILE', help='load the URLs of the file (one per line) without a window and report them as JSON lines')
+    parser.add_argument('--concurrency', type=int, default=8, help='the max number of URLs loaded at a time in batch mode')
+    parser.add_argument('--layout', action='store_true', help='also lay out every page in batch mode, with the headless font metrics')
+    parser.add_argument('--output', metavar='FILE', help='where batch mode writes its JSON lines, stdout by default')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds before a URL of the batch fails')
+    args = parser.parse_args()
+    if args.batch:
+        import src.batch as batch
+        sys.exit(batch.main(args.batch, args.concurrency, args.layout, args.output, args.timeout))
     import src.app as app
     app = app.Browser(800, 600)
-    app.run()
\ No newline at end of file
+    app.run()
@@ -3,10 +3,11 @@
 import tkinter as tk
 import tkinter.ttk as ttk
 from . import network as network
-from . import view as view
+from . import tab as tab
+from . import trace as trace
 
 class Browser:
-    def __init__(self, width, height):
+    def __init__(self, width, height, snapshot_budget=64 * 1024 * 1024):
         #Initialize the window
         self.root = tk.Tk()
         self.root.minsize(width=200, height=200)
@@ -14,7 +15,31 @@ class Browser:
         self.root.bind_all('<Button-1>', lambda event: event.widget.focus_set()) #Makes so that when any part of the GUI gets clicked, it gets focused
         self.root.geometry('{}x{}'.format(width, height))
 
-        self.view = view.View(self.root, width, height - 100) #View is a canvas element that renders the website and contains elements relevante to that function
+        self.width = width #The size new tabs' views start with
+        self.height = height - 100
+        self.snapshot_budget = snapshot_budget #The memory budget of the page snapshots of every tab
+        self.tabs = [] #Every tab has its own view (a canvas element that renders the website), history and loader
+        self.tab_buttons = {} #Dictionary of tab -> its button in the tab bar
+        self.current = None #The selected tab
+        self.addr = None #The search bar
+        self.default_text = 'Start searching the web by writing an address'
+        self.back_button = None
+        self.forward_button = None
+        self.tab_bar = None #The frame holding the tab buttons
+        self.loading = None #Label in the header that shows when a page is loading
+        self.hud = None #Label in the header that shows the timings of the last load when tracing is on
+        self.hud_job = None #The pending refresh of the HUD
+        self.HUD_STAGES = ['dns', 'connect', 'tls', 'request', 'ttfb', 'body', 'parse', 'stylesheet', 'style', 'deserialize', 'layout', 'measure', 'render', 'image', 'decode'] #Stages shown in the HUD in order
+        self.TRACE_FILE = 'galileo-trace.json' #Where Shift+F12 exports the trace
+        self.find_bar = None #The frame of find-in-page, only packed while it's open
+        self.find_entry = None
+        self.find_count = None #Label with the current match and the number of matches
+        self.find_query = '' #What was searched last, key presses that don't change the text don't search again
+
+    #The view of the selected tab
+    @property
+    def view(self):
+        return self.current.view
 
     #Runs the main loop
     def run(self):
@@ -33,13 +58,137 @@ class Browser:
             addr.insert(0, default_text)
             addr.config(fg='gray')
 
-    #Connects to the internet and loads the view's content
+    #Connects to the internet and loads the view's content, the work is done in the background and a new search cancels the previous one
     def search_web(self, addr, default_text):
         if addr.get() != default_text:
-            url = network.URL(addr.get())
-            self.view.content = network.Socket(url).load_content()
-            self.view.scroll = 0 #Make so that the view is put at top of the page
-            self.view.load()
+            try:
+                url = network.URL(addr.get())
+            except (ValueError, AssertionError):
+                self.loading.config(text='Invalid address')
+                return
+            self.current.open(url)
+
+    #Opens a new empty tab and selects it
+    def new_tab(self):
+        new = tab.Tab(self, self.width, self.height, self.snapshot_budget)
+        new.view.create_view()
+        new.view.detach()
+        self.tabs.append(new)
+        button = tk.Button(self.tab_bar, text=new.title(), command=lambda: self.select_tab(new))
+        button.pack(side='left', padx=(5, 0), pady=10)
+        self.tab_buttons[new] = button
+        self.select_tab(new)
+        return new
+
+    #Shows the tab, the previous one goes to the background
+    def select_tab(self, selected):
+        if self.current is selected: return
+        if self.current is not None:
+            self.current.deselect()
+            self.tab_buttons[self.current].config(relief='raised')
+        self.current = selected
+        self.tab_buttons[selected].config(relief='sunken')
+        selected.select()
+        self.update_tab(selected)
+        if self.find_bar.winfo_ismapped():
+            self.find_query = None #Search the page of the new tab
+            self.find_in_page()
+
+    #Closes the selected tab, the last tab is never closed
+    def close_tab(self):
+        if len(self.tabs) == 1: return
+        closed = self.current
+        index = self.tabs.index(closed)
+        self.tabs.remove(closed)
+        self.select_tab(self.tabs[min(index, len(self.tabs) - 1)])
+        self.tab_buttons.pop(closed).destroy()
+        closed.close()
+
+    #Called by a tab when its status, address or history changed
+    def update_tab(self, changed):
+        self.tab_buttons[changed].config(text=changed.title())
+        if changed is not self.current: return
+        self.loading.config(text=changed.status)
+        entry = changed.history.current()
+        if entry is not None:
+            self.set_address(str(entry.url))
+        else:
+            self.addr.delete(0, 'end')
+            self.on_focusout(None, self.addr, self.default_text)
+        self.back_button.config(state='normal' if changed.history.can_go_back() else 'disabled')
+        self.forward_button.config(state='normal' if changed.history.can_go_forward() else 'disabled')
+
+    #Shows the address of the current page in the search bar
+    def set_address(self, text):
+        self.addr.delete(0, 'end')
+        self.addr.insert(0, text)
+        self.addr.config(fg='black')
+
+    #F12 turns tracing on and off, the HUD is shown while tracing
+    def toggle_tracing(self, event=None):
+        if trace.TRACER.enabled:
+            trace.TRACER.disable()
+            self.hud.pack_forget()
+            if self.hud_job is not None:
+                self.root.after_cancel(self.hud_job)
+                self.hud_job = None
+        else:
+            trace.TRACER.enable()
+            self.hud.pack(side='left', padx=10)
+            self.update_hud()
+
+    #Shift+F12 writes the trace to a file that can be opened in chrome://tracing or Perfetto
+    def export_trace(self, event=None):
+        trace.TRACER.export(self.TRACE_FILE)
+        self.loading.config(text='Trace written to {}'.format(self.TRACE_FILE))
+
+    #Shows the time spent in every stage since the last load of the selected tab started, refreshed while tracing is on
+    #The spans of the parse worker processes are merged when their page is handed back
+    def update_hud(self):
+        self.hud_job = None
+        if not trace.TRACER.enabled: return
+        summary = trace.TRACER.summary(since=self.current.load_started)
+        stages = ['{} {:.1f}ms'.format(stage, summary[stage]['ms']) for stage in self.HUD_STAGES if stage in summary]
+        self.hud.config(text=' | '.join(stages) if stages else 'Tracing on')
+        self.hud_job = self.root.after(500, self.update_hud)
+
+    #Ctrl+F opens find-in-page, or selects its text if it's already open
+    def open_find(self, event=None):
+        self.find_bar.pack(side='right', padx=10, pady=10, before=self.addr)
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, 'end')
+        return 'break'
+
+    #Escape closes find-in-page and removes the highlights
+    def close_find(self, event=None):
+        self.find_bar.pack_forget()
+        self.find_query = ''
+        self.view.clear_find()
+        self.view.canvas.focus_set()
+
+    #Searches as the user types, only when the text changed
+    def find_in_page(self, event=None):
+        query = self.find_entry.get()
+        if query == self.find_query: return
+        self.find_query = query
+        self.view.find(query)
+        self.update_find_count()
+
+    #Enter goes to the next match and Shift+Enter to the previous one
+    def find_next(self, step=1):
+        self.find_in_page()
+        self.view.find_next(step)
+        self.update_find_count()
+        return 'break'
+
+    def update_find_count(self):
+        view = self.view
+        if not view.query:
+            self.find_count.config(text='')
+        elif not view.matches:
+            self.find_count.config(text='No matches')
+        else:
+            self.find_count.config(text='{}/{}'.format(view.match + 1, len(view.matches)))
 
     #When the search bar is in focus and the user presses Ctrl+A, it selects the entire inputed text
     def select_all(self, event, addr):
@@ -62,9 +211,35 @@ class Browser:
         header_top = tk.Frame(header, height=50, background='gray70')
         header_top.pack(side='top', fill='x')
 
+        #Back and forward buttons
+        self.back_button = tk.Button(header_top, text='←', state='disabled', command=lambda: self.current.go_back())
+        self.back_button.pack(side='left', padx=(10, 0), pady=10)
+        self.forward_button = tk.Button(header_top, text='→', state='disabled', command=lambda: self.current.go_forward())
+        self.forward_button.pack(side='left', padx=(5, 0), pady=10)
+        self.root.bind_all('<Alt-Left>', lambda event: self.current.go_back())
+        self.root.bind_all('<Alt-Right>', lambda event: self.current.go_forward())
+
+        #The tabs and the button opening a new one
+        self.tab_bar = tk.Frame(header_top, background='gray70')
+        self.tab_bar.pack(side='left', padx=(10, 0))
+        new_tab = tk.Button(header_top, text='+', command=self.new_tab)
+        new_tab.pack(side='left', padx=(5, 0), pady=10)
+        self.root.bind_all('<Control-t>', lambda event: self.new_tab())
+        self.root.bind_all('<Control-w>', lambda event: self.close_tab())
+
+        #Shows when a page is loading
+        self.loading = tk.Label(header_top, text='', background='gray70')
+        self.loading.pack(side='right', padx=10, pady=10)
+
+        #Shows the timings of the last load, only packed while tracing is on
+        self.hud = tk.Label(header_top, text='', background='gray70', font='TkFixedFont')
+        self.root.bind_all('<F12>', self.toggle_tracing)
+        self.root.bind_all('<Shift-F12>', self.export_trace)
+
         #The search bar in which you can write addresses
         addr = tk.Entry(header_bottom, fg='gray')
-        default_text = 'Start searching the web by writing an address'
+        default_text = self.default_text
+        self.addr = addr
         addr.insert(0, default_text)
         addr.bind('<FocusIn>', lambda event : self.on_entry_click(event, addr, default_text))
         addr.bind('<FocusOut>', lambda event : self.on_focusout(event, addr, default_text))
@@ -76,7 +251,19 @@ class Browser:
         search = tk.Button(header_bottom, image=self.search_icon, command=lambda : self.search_web(addr, default_text)) #Excecute the search_web if clicked
         search.pack(side='left', padx=(100, 0), pady=10)
         
+        #Find-in-page, shown with Ctrl+F
+        self.find_bar = tk.Frame(header_bottom, background='gray70')
+        self.find_entry = tk.Entry(self.find_bar, width=20)
+        self.find_entry.pack(side='left')
+        self.find_count = tk.Label(self.find_bar, text='', width=10, background='gray70')
+        self.find_count.pack(side='left', padx=(5, 0))
+        self.find_entry.bind('<KeyRelease>', self.find_in_page)
+        self.find_entry.bind('<Return>', lambda event: self.find_next(1))
+        self.find_entry.bind('<Shift-Return>', lambda event: self.find_next(-1))
+        self.find_entry.bind('<Escape>', self.close_find)
+        self.root.bind_all('<Control-f>', self.open_find)
+
         addr.pack(side='left', fill='x', expand=True, padx=(0, 10), pady=10)
 
-        #This creates the view
-        self.view.create_view()
\ No newline at end of file
+        #This creates the view of the first tab
+        self.new_tab()
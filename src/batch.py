@@ -0,0 +1,157 @@
+#The batch file loads a list of URLs without a window, used to smoke-test the engine on many pages and to warm things up
+#URLs are fetched concurrently with asyncio, with the same URL parsing, requests and body decoding as the browser
+
+import asyncio
+import json
+import sys
+import time
+import zlib
+from . import network as network
+from . import htmlparser as htmlp
+from . import css as css
+from . import trace as trace
+
+READ_SIZE = 64 * 1024 #The max number of bytes read from the stream at a time
+
+#Get the URLs of a batch file, one per line, blank lines and lines starting with # are skipped
+def read_urls(path):
+    with open(path, encoding='utf8') as file:
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith('#')]
+
+#The number of nodes of the tree
+def count_nodes(root):
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+#Yields the raw body pieces of the response from an asyncio stream, the framing is the one of network.body_framing
+async def read_body(reader, framing, length):
+    if framing == 'chunked':
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError('Connection closed in the middle of a chunked body')
+            size = network.parse_chunk_size(line)
+            if size == 0: break
+            yield await reader.readexactly(size)
+            await reader.readline() #Skip the \r\n after the chunk
+    elif framing == 'length':
+        while length > 0:
+            piece = await reader.read(min(length, READ_SIZE))
+            if not piece:
+                raise ConnectionError('Connection closed before the whole body was received')
+            length -= len(piece)
+            yield piece
+    elif framing == 'close':
+        while True:
+            piece = await reader.read(READ_SIZE)
+            if not piece: break
+            yield piece
+
+#Fetches and parses one page, the body is parsed while it's received
+#Returns the root node and fills the record with the status and the timings
+async def fetch_and_parse(url, record):
+    start = time.perf_counter()
+    parser = htmlp.HTMLParser('')
+    if url.scheme == 'file': #Local files don't need the event loop, they're read in a thread
+        content = await asyncio.to_thread(network.Socket(url).load_content)
+        record['bytes'] = len(content.encode('utf8'))
+        record['ttfb_ms'] = (time.perf_counter() - start) * 1000
+        parse_start = time.perf_counter()
+        parser.feed(content)
+        root = parser.close()
+        record['parse_ms'] = (time.perf_counter() - parse_start) * 1000
+        return root
+    host, port = url.host, url.get_port()
+    tls_context = network.TLS.get_context() if url.scheme == 'https' else None
+    reader, writer = await asyncio.open_connection(host, port, ssl=tls_context, server_hostname=host if tls_context else None)
+    try:
+        record['connect_ms'] = (time.perf_counter() - start) * 1000
+        headers = {'Host': host, 'Connection': 'close', 'Accept-Encoding': 'gzip, deflate'} #One connection per page
+        writer.write(network.build_request(url.path, headers))
+        await writer.drain()
+        statusline = await reader.readline()
+        if not statusline:
+            raise ConnectionError('Connection closed by the server')
+        record['ttfb_ms'] = (time.perf_counter() - start) * 1000
+        version, status = network.parse_status_line(statusline)
+        record['status'] = status
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''): break
+            header, value = network.parse_header_line(line)
+            response_headers[header] = value
+        decoder = network.BodyDecoder(response_headers)
+        framing, length = network.body_framing(status, response_headers)
+        parse_time = 0
+        async for piece in read_body(reader, framing, length):
+            record['bytes'] += len(piece)
+            text = decoder.feed(piece)
+            if text:
+                parse_start = time.perf_counter()
+                parser.feed(text)
+                parse_time += time.perf_counter() - parse_start
+        parse_start = time.perf_counter()
+        parser.feed(decoder.finish())
+        root = parser.close()
+        record['parse_ms'] = (parse_time + time.perf_counter() - parse_start) * 1000
+        return root
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass #The page is already read, a reset while closing doesn't matter
+
+#Loads one URL of the batch and returns its record, errors are reported in the record instead of stopping the batch
+async def load(index, url_text, semaphore, font_cache, timeout):
+    record = {'index': index, 'url': url_text, 'status': None, 'error': None, 'bytes': 0, 'nodes': 0}
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            url = network.URL(url_text)
+            root = await asyncio.wait_for(fetch_and_parse(url, record), timeout)
+            record['nodes'] = count_nodes(root)
+            if font_cache is not None:
+                from . import view as view #Only needed with --layout, it imports Tkinter
+                layout_start = time.perf_counter()
+                css.style_tree(root)
+                record['words'] = len(view.Layout(root, 800, 600, font_cache).display_list)
+                record['layout_ms'] = (time.perf_counter() - layout_start) * 1000
+        except asyncio.TimeoutError:
+            record['error'] = 'Timed out after {}s'.format(timeout)
+        except (OSError, ValueError, AssertionError, UnicodeError, zlib.error, asyncio.IncompleteReadError) as error:
+            record['error'] = '{}: {}'.format(type(error).__name__, error) if str(error) else type(error).__name__
+        record['total_ms'] = (time.perf_counter() - start) * 1000
+    return record
+
+#Loads every URL with at most concurrency loads at a time and writes one JSON record per line as they finish
+async def run_batch(urls, output, concurrency=8, layout=False, timeout=30.0):
+    from . import fonts as fonts
+    semaphore = asyncio.Semaphore(concurrency)
+    font_cache = fonts.FontCache(fonts.HeadlessMetrics()) if layout else None #Shared so the measurements are reused between pages
+    tasks = [load(index, url, semaphore, font_cache, timeout) for index, url in enumerate(urls)]
+    failed = 0
+    for task in asyncio.as_completed(tasks):
+        record = await task
+        failed += record['error'] is not None
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+    return failed
+
+#Runs a batch file, the results go to the output file or to stdout, returns the exit status (1 if some URLs failed)
+def main(batch, concurrency=8, layout=False, output=None, timeout=30.0):
+    urls = read_urls(batch)
+    with trace.TRACER.span('batch', 'batch', urls=len(urls)):
+        if output is None:
+            failed = asyncio.run(run_batch(urls, sys.stdout, concurrency, layout, timeout))
+        else:
+            with open(output, 'w', encoding='utf8') as file:
+                failed = asyncio.run(run_batch(urls, file, concurrency, layout, timeout))
+    print('{} URLs, {} failed'.format(len(urls), failed), file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,213 @@
+#The cache file keeps loaded responses so that the same URL doesn't have to go to the network again
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+#A cached response and what's needed to know if it can still be used
+class CacheEntry:
+    def __init__(self, url, body, etag='', last_modified='', expires=0.0, fetch_time=0.0):
+        self.url = url
+        self.body = body #The HTML code
+        self.etag = etag #Validators used for conditional requests
+        self.last_modified = last_modified
+        self.expires = expires #Timestamp after which the entry has to be revalidated
+        self.fetch_time = fetch_time #How long the network took to get the body, used to count the time saved
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    #Whether the server can be asked if the entry changed instead of sending it again
+    def can_revalidate(self):
+        return bool(self.etag or self.last_modified)
+
+    def size(self):
+        return len(self.body) + len(self.url)
+
+    def to_json(self):
+        return json.dumps({
+            'url': self.url, 'body': self.body, 'etag': self.etag,
+            'last_modified': self.last_modified, 'expires': self.expires, 'fetch_time': self.fetch_time
+        })
+
+    @staticmethod
+    def from_json(text):
+        return CacheEntry(**json.loads(text))
+
+#Gets the directives of a Cache-Control header as a dictionary (max-age=60, no-store -> {'max-age': '60', 'no-store': ''})
+def parse_cache_control(value):
+    directives = {}
+    for directive in value.split(','):
+        if not directive.strip(): continue
+        name, _, arg = directive.partition('=')
+        directives[name.strip().casefold()] = arg.strip().strip('"')
+    return directives
+
+#How many seconds a response stays fresh, no-cache means it has to be revalidated every time
+def get_max_age(directives):
+    if 'no-cache' in directives: return 0
+    try:
+        return max(0, int(directives.get('max-age', 0)))
+    except ValueError:
+        return 0
+
+#HTTP cache made of an in-memory LRU backed by a size-capped directory on disk
+#Entries are keyed by the normalized URL
+class ResponseCache:
+    def __init__(self, directory=None, max_entries=64, max_disk_size=50 * 1024 * 1024):
+        self.directory = directory or os.path.join(os.path.expanduser('~'), '.cache', 'galileo') #Where the cache survives restarts
+        self.max_entries = max_entries #The max number of entries kept in memory
+        self.max_disk_size = max_disk_size #The max number of bytes the disk store can take
+        self.memory = collections.OrderedDict() #The most recently used entries are at the end
+        self.disk_index = None #Dictionary of file name -> (size, last use), loaded the first time the disk is used
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.hits = 0 #Fresh entries used without going to the network
+        self.misses = 0 #Loads that had to get the whole body from the network
+        self.revalidations = 0 #Stale entries the server confirmed with 304
+        self.saved_time = 0.0 #Network seconds saved by hits and revalidations
+
+    #Get the entry for the key from memory or disk, or None
+    def lookup(self, key):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                return entry
+            entry = self.read_disk(key)
+            if entry is not None:
+                self.remember(key, entry)
+            return entry
+
+    #Store a response based on its Cache-Control, returns the entry or None if the response can't be cached
+    def store(self, key, body, headers, fetch_time=0.0):
+        directives = parse_cache_control(headers.get('cache-control', ''))
+        if 'no-store' in directives:
+            self.remove(key)
+            return None
+        etag = headers.get('etag', '')
+        last_modified = headers.get('last-modified', '')
+        max_age = get_max_age(directives)
+        if max_age == 0 and not (etag or last_modified):
+            return None #The entry could never be used again without downloading it anyway
+        entry = CacheEntry(key, body, etag, last_modified, time.time() + max_age, fetch_time)
+        with self.lock:
+            self.remember(key, entry)
+            self.write_disk(key, entry)
+        return entry
+
+    #Update an entry after the server answered 304 Not Modified, fetch_time is how long the revalidation took
+    #The time saved is what downloading the body took minus the round trip of the revalidation
+    def revalidated(self, key, entry, headers, fetch_time=0.0):
+        directives = parse_cache_control(headers.get('cache-control', ''))
+        with self.lock:
+            self.revalidations += 1
+            self.saved_time += max(0.0, entry.fetch_time - fetch_time)
+        if 'no-store' in directives: #The body can still be used this time but must not be kept
+            self.remove(key)
+            return
+        entry.expires = time.time() + get_max_age(directives)
+        entry.etag = headers.get('etag', entry.etag)
+        entry.last_modified = headers.get('last-modified', entry.last_modified)
+        with self.lock:
+            self.remember(key, entry)
+            self.write_disk(key, entry)
+
+    def remove(self, key):
+        with self.lock:
+            self.memory.pop(key, None)
+            self.remove_disk(self.file_name(key))
+
+    #Count a fresh hit and the network time it saved
+    def hit(self, entry):
+        with self.lock:
+            self.hits += 1
+            self.saved_time += entry.fetch_time
+
+    def miss(self):
+        with self.lock:
+            self.misses += 1
+
+    #The counters of the cache
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits, 'misses': self.misses, 'revalidations': self.revalidations,
+                'saved_time': self.saved_time, 'memory_entries': len(self.memory),
+                'disk_size': self.disk_size
+            }
+
+    #Put an entry in the memory LRU and evict the least recently used ones
+    def remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def file_name(self, key):
+        return hashlib.sha1(key.encode('utf8')).hexdigest() + '.json'
+
+    #Scan the cache directory once to know what's stored on disk
+    def load_disk_index(self):
+        if self.disk_index is not None: return
+        self.disk_index = {}
+        self.disk_size = 0
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for file in os.scandir(self.directory):
+                if file.name.endswith('.json'):
+                    stat = file.stat()
+                    self.disk_index[file.name] = (stat.st_size, stat.st_mtime)
+                    self.disk_size += stat.st_size
+        except OSError:
+            pass #The cache then only works in memory
+
+    def read_disk(self, key):
+        self.load_disk_index()
+        name = self.file_name(key)
+        if name not in self.disk_index: return None
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, encoding='utf8') as file:
+                entry = CacheEntry.from_json(file.read())
+            os.utime(path) #Mark the file as recently used
+        except (OSError, ValueError, TypeError):
+            self.remove_disk(name)
+            return None
+        self.disk_index[name] = (self.disk_index[name][0], time.time())
+        return entry if entry.url == key else None
+
+    def write_disk(self, key, entry):
+        self.load_disk_index()
+        name = self.file_name(key)
+        data = entry.to_json().encode('utf8')
+        if len(data) > self.max_disk_size: return
+        self.remove_disk(name)
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path + '.tmp', 'wb') as file:
+                file.write(data)
+            os.replace(path + '.tmp', path) #Readers never see a half written entry
+        except OSError:
+            return
+        self.disk_index[name] = (len(data), time.time())
+        self.disk_size += len(data)
+        #Evict the least recently used files until the store fits in its size
+        if self.disk_size > self.max_disk_size:
+            for old in sorted(self.disk_index, key=lambda name: self.disk_index[name][1]):
+                if self.disk_size <= self.max_disk_size: break
+                if old != name:
+                    self.remove_disk(old)
+
+    def remove_disk(self, name):
+        self.load_disk_index()
+        if name not in self.disk_index: return
+        size, last_use = self.disk_index.pop(name)
+        self.disk_size -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
@@ -0,0 +1,360 @@
+#The css file parses stylesheets and computes the style of every element of the tree
+#Only font-size, font-weight, font-style and text-align are used by the layout, they are all inherited
+
+import collections
+import re
+import threading
+from . import htmlparser as htmlp
+from . import trace as trace
+
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+COMPOUND_RE = re.compile(r'^([a-zA-Z][\w-]*|\*)?((?:[.#][\w-]+)*)$') #A tag followed by classes and ids, like div.note#main
+PART_RE = re.compile(r'[.#][\w-]+')
+BRACE_RE = re.compile(r'[{}]')
+LINK_RE = re.compile(r'<(link\b[^<>]*)>', re.I) #Matched like HTMLParser.TAG_RE matches tags
+
+#The browser's own stylesheet, it replaces the tags that used to be hard-coded in the layout
+DEFAULT_STYLE_SHEET = '''
+i, em, cite, var, dfn, address { font-style: italic }
+b, strong, th { font-weight: bold }
+small { font-size: 83% }
+big { font-size: 133% }
+h1 { font-size: 150%; text-align: center }
+h2 { font-size: 125%; font-weight: bold }
+h3 { font-size: 117%; font-weight: bold }
+h4, h5, h6 { font-weight: bold }
+center { text-align: center }
+'''
+
+#Font sizes in points for the keywords, medium is the default size of the layout
+FONT_SIZE_KEYWORDS = {
+    'xx-small': 7, 'x-small': 8, 'small': 10, 'medium': 12,
+    'large': 14, 'x-large': 18, 'xx-large': 24,
+}
+
+#One part of a selector without combinators, like div.note#main
+class SimpleSelector:
+    __slots__ = ('tag', 'id', 'classes')
+
+    def __init__(self, tag, id, classes):
+        self.tag = tag #None matches any tag
+        self.id = id
+        self.classes = classes #A frozenset, every class has to be on the element
+
+    def matches(self, node):
+        if self.tag is not None and self.tag != node.tag: return False
+        attributes = node.attributes
+        if self.id is not None and attributes.get('id') != self.id: return False
+        return not self.classes or self.classes.issubset(attributes.get('class', '').split())
+
+    #The number of ids, classes and tags, compared in that order
+    def specificity(self):
+        return (self.id is not None, len(self.classes), self.tag is not None)
+
+    #The most selective thing an element needs to match, used to index rules
+    def key(self):
+        if self.id is not None: return '#' + self.id
+        if self.classes: return '.' + min(self.classes)
+        if self.tag is not None: return self.tag
+        return '*'
+
+#A selector with descendant combinators (div p), parts are ordered from the outermost to the element itself
+class Selector:
+    __slots__ = ('parts', 'specificity')
+
+    def __init__(self, parts):
+        self.parts = parts
+        specificities = [part.specificity() for part in parts]
+        self.specificity = tuple(sum(values) for values in zip(*specificities))
+
+    #The last part is tested on the element, the others on its ancestors from the closest one
+    def matches(self, node):
+        parts = self.parts
+        if not parts[-1].matches(node): return False
+        index = len(parts) - 2
+        node = node.parent
+        while index >= 0 and node is not None:
+            if parts[index].matches(node):
+                index -= 1
+            node = node.parent
+        return index < 0
+
+    #The bucket the selector is indexed in, from its last part
+    def key(self):
+        return self.parts[-1].key()
+
+    #What the closest ancestor part needs, the selector can only match under an element with that key (None if anything goes)
+    def ancestor_key(self):
+        if len(self.parts) < 2: return None
+        key = self.parts[-2].key()
+        return None if key == '*' else key
+
+#The keys an element can be found with in the index: its tag, #id and .classes
+def node_keys(node):
+    attributes = node.attributes
+    keys = [node.tag]
+    if 'id' in attributes:
+        keys.append('#' + attributes['id'])
+    for name in set(attributes.get('class', '').split()):
+        keys.append('.' + name)
+    return keys
+
+#A selector with its declarations, order is the position in the stylesheet
+class Rule:
+    __slots__ = ('selector', 'declarations', 'order')
+
+    def __init__(self, selector, declarations, order):
+        self.selector = selector
+        self.declarations = declarations #A tuple of (property, value)
+        self.order = order
+
+#Parses a selector like 'div .note', None if it uses something that isn't supported (>, +, ~, [attr], :hover...)
+def parse_selector(text):
+    parts = []
+    for compound in text.split():
+        match = COMPOUND_RE.match(compound)
+        if match is None: return None
+        tag, rest = match.groups()
+        tag = None if tag in (None, '*') else tag.casefold()
+        id = None
+        classes = []
+        for part in PART_RE.findall(rest):
+            if part[0] == '#':
+                id = part[1:]
+            else:
+                classes.append(part[1:])
+        parts.append(SimpleSelector(tag, id, frozenset(classes)))
+    return Selector(parts) if parts else None
+
+#Parses the declarations of a rule or a style attribute, like 'font-size: 12px; color: red'
+def parse_declarations(text):
+    declarations = []
+    for declaration in text.split(';'):
+        property, colon, value = declaration.partition(':')
+        if not colon: continue
+        value = value.replace('!important', '').strip() #Not supported, the declaration is still used
+        if value:
+            declarations.append((property.strip().casefold(), value.casefold()))
+    return tuple(declarations)
+
+#A parsed stylesheet
+class StyleSheet:
+    def __init__(self, text):
+        self.rules = []
+        self.parse(text)
+
+    #Reads every rule, at-rules like @media and @font-face are skipped with their blocks
+    def parse(self, text):
+        text = COMMENT_RE.sub('', text)
+        pos = 0
+        while True:
+            start = text.find('{', pos)
+            if start < 0: break
+            end = self.find_block_end(text, start)
+            prelude = text[pos:start].rsplit(';', 1)[-1].strip() #Statements like @import url(a.css); come before
+            pos = end + 1
+            if prelude.startswith('@'): continue
+            declarations = parse_declarations(text[start + 1:end])
+            if not declarations: continue
+            for selector_text in prelude.split(','):
+                selector = parse_selector(selector_text)
+                if selector is not None:
+                    self.rules.append(Rule(selector, declarations, len(self.rules)))
+
+    #Get the index of the } closing the block opened at start, blocks can be nested in at-rules
+    def find_block_end(self, text, start):
+        depth = 0
+        for match in BRACE_RE.finditer(text, start):
+            depth += 1 if match.group() == '{' else -1
+            if depth == 0:
+                return match.start()
+        return len(text)
+
+#Parsed stylesheets by URL, the text is kept to check that the stylesheet didn't change
+class StyleSheetCache:
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self.sheets = collections.OrderedDict() #URL -> (text, StyleSheet), the least recently used first
+        self.lock = threading.Lock()
+
+    #Get the parsed stylesheet for the text found at the URL, it's only parsed again if the text changed
+    def get(self, url, text):
+        with self.lock:
+            entry = self.sheets.get(url)
+            if entry is not None and entry[0] == text:
+                self.sheets.move_to_end(url)
+                return entry[1]
+        with trace.TRACER.span('css_parse', 'style', url=url, size=len(text)):
+            sheet = StyleSheet(text)
+        with self.lock:
+            self.sheets[url] = (text, sheet)
+            self.sheets.move_to_end(url)
+            while len(self.sheets) > self.max_entries:
+                self.sheets.popitem(last=False)
+        return sheet
+
+    def clear(self):
+        with self.lock:
+            self.sheets.clear()
+
+SHEETS = StyleSheetCache() #Shared stylesheet cache
+DEFAULT = StyleSheet(DEFAULT_STYLE_SHEET)
+
+#The computed style of an element, every element with the same values shares one instance
+class ComputedStyle:
+    __slots__ = ('size', 'weight', 'style', 'align')
+
+    def __init__(self, size, weight, style, align):
+        self.size = size #In points like the layout
+        self.weight = weight #normal or bold
+        self.style = style #roman or italic
+        self.align = align #left, center or right
+
+    def values(self):
+        return (self.size, self.weight, self.style, self.align)
+
+    def __repr__(self):
+        return 'ComputedStyle' + repr(self.values())
+
+INITIAL_STYLE = ComputedStyle(12, 'normal', 'roman', 'left')
+
+#Get the font size in points from a CSS value, None if it isn't understood
+def parse_font_size(value, parent_size):
+    try:
+        if value in FONT_SIZE_KEYWORDS: return FONT_SIZE_KEYWORDS[value]
+        if value == 'smaller': return parent_size / 1.2
+        if value == 'larger': return parent_size * 1.2
+        if value.endswith('px'): return float(value[:-2]) * 0.75
+        if value.endswith('pt'): return float(value[:-2])
+        if value.endswith('rem'): return float(value[:-3]) * INITIAL_STYLE.size
+        if value.endswith('em'): return float(value[:-2]) * parent_size
+        if value.endswith('%'): return float(value[:-1]) * parent_size / 100
+    except ValueError:
+        pass
+    return None
+
+#Rules of several stylesheets indexed by the key of their selector, then by the key of the closest ancestor part
+#An element is only tested against the rules of its tag, id and classes whose ancestor is among its ancestors,
+#instead of against every rule, so descendant selectors like '.menu a' don't get tested on every link of the page
+class Cascade:
+    def __init__(self, sheets, default=DEFAULT):
+        self.buckets = {} #Key -> ancestor key or None -> list of (priority, rule)
+        for position, sheet in enumerate([default] + list(sheets)):
+            origin = 0 if position == 0 else 1 #The browser's stylesheet always loses against the page's
+            for rule in sheet.rules:
+                priority = (origin, rule.selector.specificity, position, rule.order)
+                groups = self.buckets.setdefault(rule.selector.key(), {})
+                groups.setdefault(rule.selector.ancestor_key(), []).append((priority, rule))
+        self.ancestors = {} #Keys of the elements above the one being styled -> how many of them have it
+        self.styles = {} #Values -> ComputedStyle, so equal styles are one object
+
+    #Get the declarations that apply to the element in cascade order
+    def match(self, node, keys):
+        candidates = []
+        ancestors = self.ancestors
+        for key in keys + ['*']:
+            groups = self.buckets.get(key)
+            if groups is None: continue
+            if len(groups) <= len(ancestors):
+                for ancestor, rules in groups.items():
+                    if ancestor is None or ancestor in ancestors:
+                        candidates += rules
+            else:
+                candidates += groups.get(None, ())
+                for ancestor in ancestors:
+                    candidates += groups.get(ancestor, ())
+        matched = [(priority, rule) for priority, rule in candidates if rule.selector.matches(node)]
+        matched.sort(key=lambda item: item[0])
+        declarations = [declaration for priority, rule in matched for declaration in rule.declarations]
+        if 'style' in node.attributes:
+            declarations += parse_declarations(node.attributes['style']) #The style attribute wins over the rules
+        return declarations
+
+    #Applies the declarations on top of the parent's style
+    def compute(self, parent, declarations):
+        size, weight, style, align = parent.values()
+        for property, value in declarations:
+            if value == 'inherit':
+                continue #Every supported property is inherited anyway
+            if property == 'font-size':
+                size = INITIAL_STYLE.size if value == 'initial' else parse_font_size(value, parent.size) or size
+            elif property == 'font-weight':
+                weight = 'bold' if value in ('bold', 'bolder') or value.isdigit() and int(value) >= 600 else 'normal'
+            elif property == 'font-style':
+                style = 'italic' if value in ('italic', 'oblique') else 'roman'
+            elif property == 'text-align':
+                align = value if value in ('center', 'right') else 'left'
+        values = (max(1, round(size)), weight, style, align)
+        computed = self.styles.get(values)
+        if computed is None:
+            computed = self.styles[values] = ComputedStyle(*values)
+        return computed
+
+    #Sets the style of every element of the tree
+    #Siblings with the same tag, id, classes and style attribute have the same ancestors, so they get the style of the first one without matching
+    def style_tree(self, root):
+        with trace.TRACER.span('style', 'style'):
+            ancestors = self.ancestors
+            stack = [(root, INITIAL_STYLE, {}, None)]
+            while stack:
+                node, parent_style, siblings, closing = stack.pop()
+                if closing is not None: #Leaving the element, its keys aren't ancestors anymore
+                    for key in closing:
+                        ancestors[key] -= 1
+                        if not ancestors[key]: del ancestors[key]
+                    continue
+                if isinstance(node, htmlp.Text): continue
+                attributes = node.attributes
+                keys = node_keys(node)
+                key = (node.tag, attributes.get('id'), attributes.get('class'), attributes.get('style'))
+                style = siblings.get(key)
+                if style is None:
+                    style = siblings[key] = self.compute(parent_style, self.match(node, keys))
+                node.style = style
+                if node.children:
+                    stack.append((node, None, None, keys))
+                    for key in keys:
+                        ancestors[key] = ancestors.get(key, 0) + 1
+                    children = {} #Styles already computed for the children of this node
+                    for child in reversed(node.children):
+                        stack.append((child, style, children, None))
+
+#Get the text of the <style> elements and the href of the stylesheet <link> elements, in document order
+#Returns a list of ('style', text) and ('link', href)
+def find_stylesheets(root):
+    found = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, htmlp.Text): continue
+        if node.tag == 'style':
+            found.append(('style', ''.join(child.text for child in node.children if isinstance(child, htmlp.Text))))
+        elif node.tag == 'link' and 'href' in node.attributes and \
+                'stylesheet' in node.attributes.get('rel', '').casefold().split():
+            found.append(('link', node.attributes['href']))
+        stack.extend(reversed(node.children))
+    return found
+
+#Get the href of the stylesheet <link> elements from the HTML code without building the tree, in document order
+#Used to start loading the stylesheets before the page is parsed
+def find_stylesheet_links(html):
+    parser = htmlp.HTMLParser('')
+    hrefs = []
+    for match in LINK_RE.finditer(html):
+        tag, attributes = parser.get_attributes(match.group(1))
+        if 'href' in attributes and 'stylesheet' in attributes.get('rel', '').casefold().split():
+            hrefs.append(attributes['href'])
+    return hrefs
+
+#Sets the style of every element from the <style> elements of the page, stylesheets from links are loaded with load(href) if given
+#load(href) returns the URL and the text of the stylesheet, or None if it can't be loaded
+def style_tree(root, load=None, cache=SHEETS):
+    sheets = []
+    for kind, value in find_stylesheets(root):
+        if kind == 'style':
+            sheets.append(StyleSheet(value))
+        elif load is not None:
+            loaded = load(value)
+            if loaded is not None:
+                sheets.append(cache.get(*loaded))
+    Cascade(sheets).style_tree(root)
@@ -0,0 +1,79 @@
+#The display list file stores the laid out words in columns instead of one tuple per word
+#Coordinates are kept in arrays, words in a string table and fonts as small ids into the font cache
+
+import array
+import bisect
+
+IMAGE = 0xFFFF #The font id of images, their word is the URL of the image
+
+#Columnar list of (x, y, word, font) entries and of the lines they are in
+class DisplayList:
+    def __init__(self, font_cache):
+        self.fonts = font_cache #Turns font ids back into fonts
+        self.xs = array.array('d') #The x coordinate of every word
+        self.ys = array.array('d') #The y coordinate of every word
+        self.word_ids = array.array('I') #The id of every word in the string table
+        self.font_ids = array.array('H') #The id of the font of every word in the font cache
+        self.words = [] #String table, every different word is stored once
+        self.word_table = {} #Dictionary of word -> id in the string table
+        self.line_starts = array.array('I') #Index of the first word of every line
+        self.line_tops = array.array('d') #The y coordinate every line starts at, in increasing order
+        self.line_bottoms = array.array('d') #The y coordinate every line ends at, in increasing order
+        self.image_sizes = {} #Dictionary of index -> (width, height) of the images, they are rare so they aren't a column
+        self.image_indices = array.array('I') #The index of every image, in increasing order
+
+    #Adds a word at the given position
+    def append(self, x, y, word, font_id):
+        word_id = self.word_table.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.words.append(word)
+            self.word_table[word] = word_id
+        self.xs.append(x)
+        self.ys.append(y)
+        self.word_ids.append(word_id)
+        self.font_ids.append(font_id)
+
+    #Adds an image box at the given position, src is the URL of the image
+    def append_image(self, x, y, src, width, height):
+        self.image_sizes[len(self.xs)] = (width, height)
+        self.image_indices.append(len(self.xs))
+        self.append(x, y, src, IMAGE)
+
+    #Get the indices of the images in the range of indices
+    def images_in(self, start, end):
+        indices = self.image_indices
+        return indices[bisect.bisect_left(indices, start):bisect.bisect_left(indices, end)]
+
+    #Starts a new line, the words appended after this call belong to it
+    def start_line(self, top):
+        self.line_starts.append(len(self.xs))
+        self.line_tops.append(top)
+
+    #Ends the current line
+    def end_line(self, bottom):
+        self.line_bottoms.append(bottom)
+
+    def __len__(self):
+        return len(self.xs)
+
+    #Get the entry as a (x, y, word, font) tuple, the font of images is None
+    def __getitem__(self, i):
+        font_id = self.font_ids[i]
+        return self.xs[i], self.ys[i], self.words[self.word_ids[i]], self.fonts.font_by_id(font_id) if font_id != IMAGE else None
+
+    #Iterate over (x, y, word, font) tuples, optionally only in the range of indices
+    def __iter__(self):
+        return self.entries(0, len(self.xs))
+
+    def entries(self, start, end):
+        xs, ys, words, word_ids, font_ids = self.xs, self.ys, self.words, self.word_ids, self.font_ids
+        font_by_id = self.fonts.font_by_id
+        for i in range(start, end):
+            font_id = font_ids[i]
+            yield xs[i], ys[i], words[word_ids[i]], font_by_id(font_id) if font_id != IMAGE else None
+
+    #The number of bytes used by the columns and the string table
+    def nbytes(self):
+        columns = (self.xs, self.ys, self.word_ids, self.font_ids, self.line_starts, self.line_tops, self.line_bottoms, self.image_indices)
+        return sum(column.itemsize * len(column) for column in columns) + sum(len(word) for word in self.words) + 64 * len(self.image_sizes)
@@ -0,0 +1,108 @@
+#The find file indexes the words of a layout for find-in-page
+#The index is built once per layout, searching while typing then only looks at the index instead of the whole display list
+
+import array
+import bisect
+import heapq
+from . import displaylist as displaylist
+
+#Index of the words of a display list: every different word with its positions, and all the words in one text for phrases
+#Matches are (first, last) display list indices of the words a match starts and ends in, in page order
+class SearchIndex:
+    def __init__(self, display_list):
+        self.display_list = display_list
+        self.indexed = 0 #The number of display list entries already indexed, the layout can still be adding words
+        self.positions = {} #Dictionary of casefolded word -> array of its display list indices
+        self.indices = array.array('I') #The display list index of every indexed word (images aren't indexed)
+        self.offsets = array.array('I') #Where every indexed word starts in the text
+        self.pieces = [] #The casefolded words, joined into the text only when a phrase is searched
+        self.length = 0 #The length of the text with every piece
+        self.text = '' #The casefolded words separated by spaces
+        self.last_query = None #The last search and what it found, a longer query only has to check those
+        self.last_words = None #Set of the words of the vocabulary containing the last query, for queries without spaces
+        self.last_starts = None #Where the last query was found in the text, for phrases
+
+    #Indexes the words added to the display list since the last update, returns the matches of the last search among them
+    #Earlier matches stay valid, so while the layout is adding words only the new ones are searched
+    def update(self):
+        display_list = self.display_list
+        end = len(display_list)
+        if self.indexed == end: return []
+        words, word_ids, font_ids = display_list.words, display_list.word_ids, display_list.font_ids
+        positions = self.positions
+        query = self.last_query
+        last_words = self.last_words if query is not None else None
+        old_length = self.length
+        matches = []
+        for i in range(self.indexed, end):
+            if font_ids[i] == displaylist.IMAGE: continue
+            word = words[word_ids[i]].casefold()
+            found = positions.get(word)
+            if found is None:
+                found = positions[word] = array.array('I')
+                if last_words is not None and query in word:
+                    last_words.add(word)
+            found.append(i)
+            if last_words is not None and word in last_words:
+                matches.append((i, i))
+            self.indices.append(i)
+            self.offsets.append(self.length)
+            self.pieces.append(word)
+            self.length += len(word) + 1
+        self.indexed = end
+        if query is not None and self.last_starts is not None:
+            #Only phrases ending in the new words are new, they can start in the last old words
+            starts = [start for start in self.find_starts(query, max(0, old_length - len(query))) if start + len(query) >= old_length]
+            self.last_starts.extend(starts)
+            matches = [(self.word_at(start), self.word_at(start + len(query) - 1)) for start in starts]
+        return matches
+
+    #Finds where the query is in the text from the offset on, only the words from there are joined
+    def find_starts(self, query, offset):
+        first = max(0, bisect.bisect_right(self.offsets, offset) - 1)
+        if first >= len(self.offsets): return []
+        base = self.offsets[first]
+        text = ' '.join(self.pieces[first:])
+        starts = []
+        start = text.find(query, offset - base)
+        while start >= 0:
+            starts.append(base + start)
+            start = text.find(query, start + 1)
+        return starts
+
+    def get_text(self):
+        if len(self.text) + 1 < self.length:
+            self.text = ' '.join(self.pieces)
+        return self.text
+
+    #Finds every match of the query, case and repeated spaces are ignored
+    def search(self, query):
+        query = ' '.join(query.casefold().split())
+        if not query: return []
+        last = self.last_query
+        narrowing = last is not None and query.startswith(last) #Typing one more letter can only remove matches
+        if ' ' not in query:
+            #Only the different words are scanned, then their positions are merged in page order
+            vocabulary = self.last_words if narrowing and self.last_words is not None else self.positions
+            self.last_words = {word for word in vocabulary if query in word}
+            self.last_starts = None
+            matches = [(i, i) for i in heapq.merge(*(self.positions[word] for word in self.last_words))]
+        else:
+            text = self.get_text()
+            if narrowing and self.last_starts is not None:
+                starts = [start for start in self.last_starts if text.startswith(query, start)]
+            else:
+                starts = []
+                start = text.find(query)
+                while start >= 0:
+                    starts.append(start)
+                    start = text.find(query, start + 1)
+            self.last_starts = starts
+            self.last_words = None
+            matches = [(self.word_at(start), self.word_at(start + len(query) - 1)) for start in starts]
+        self.last_query = query
+        return matches
+
+    #Get the display list index of the word at the offset of the text
+    def word_at(self, offset):
+        return self.indices[bisect.bisect_right(self.offsets, offset) - 1]
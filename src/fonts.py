@@ -0,0 +1,125 @@
+#The fonts file caches fonts and their measurements
+#Every measurement is a round-trip to Tcl, so the results are shared between layouts and page loads
+#Measurements come from a backend: Tk for the GUI, or a deterministic table when running without a display
+
+import collections
+import tkinter
+import tkinter.font
+from . import trace as trace
+
+#Measures text with real Tk fonts, needs a display
+class TkMetrics:
+    def __init__(self):
+        self.fonts = {} #Dictionary of (size, weight, style) -> (font, label)
+
+    def get_font(self, size, weight, style):
+        key = (size, weight, style)
+        if key not in self.fonts:
+            font = tkinter.font.Font(size=size, weight=weight, slant=style)
+            label = tkinter.Label(font=font) #Keeping a label using the font makes Tk keep it loaded, which makes measuring faster
+            self.fonts[key] = (font, label)
+        return self.fonts[key][0]
+
+    def measure(self, size, weight, style, word):
+        return self.get_font(size, weight, style).measure(word)
+
+    def metrics(self, size, weight, style):
+        return self.get_font(size, weight, style).metrics()
+
+#Measures text from a table of character widths, gives the same results on every machine and doesn't need a display
+class HeadlessMetrics:
+    #Widths of characters as a fraction of the font size, close to a sans-serif font
+    DEFAULT_TABLE = {
+        ' ': 0.28, 'i': 0.22, 'j': 0.22, 'l': 0.22, 'f': 0.28, 't': 0.28, 'r': 0.33,
+        'm': 0.83, 'w': 0.72, 'M': 0.83, 'W': 0.94, '.': 0.28, ',': 0.28, ':': 0.28,
+        ';': 0.28, '!': 0.28, '\'': 0.19, '|': 0.26, 'I': 0.28
+    }
+
+    def __init__(self, table=None, default_width=0.56, bold_factor=1.1, ascent=1.0, descent=0.25):
+        self.table = table if table is not None else self.DEFAULT_TABLE #Dictionary of character -> width as a fraction of the size
+        self.default_width = default_width #The width of characters not in the table
+        self.bold_factor = bold_factor #How much wider bold text is
+        self.ascent = ascent #The ascent and descent as a fraction of the size
+        self.descent = descent
+
+    #There are no real fonts, the key is enough to describe one
+    def get_font(self, size, weight, style):
+        return (size, weight, style)
+
+    def measure(self, size, weight, style, word):
+        table, default_width = self.table, self.default_width
+        w = sum(table.get(c, default_width) for c in word) * size
+        if weight == 'bold':
+            w *= self.bold_factor
+        return round(w)
+
+    def metrics(self, size, weight, style):
+        ascent = round(size * self.ascent)
+        descent = round(size * self.descent)
+        return {'ascent': ascent, 'descent': descent, 'linespace': ascent + descent, 'fixed': 0}
+
+#Caches fonts, their metrics and the widths of words measured with them
+class FontCache:
+    def __init__(self, backend=None, max_words=200000):
+        self.backend = backend if backend is not None else TkMetrics() #Where the measurements come from
+        self.font_ids = {} #Dictionary of (size, weight, style) -> small integer id, used by display lists
+        self.font_keys = [] #The (size, weight, style) of every font id
+        self.metrics = {} #Dictionary of (size, weight, style) -> metrics of the font (ascent, descent, linespace, fixed)
+        self.widths = collections.OrderedDict() #Widths of words keyed by (size, weight, style, word), the most recently used are at the end
+        self.max_words = max_words #The max number of word widths kept
+        self.hits = 0 #Measurements answered from the cache
+        self.misses = 0 #Measurements that had to go to the backend
+
+    #Get the font, it is created only once by the backend
+    def get_font(self, size, weight, style):
+        return self.backend.get_font(size, weight, style)
+
+    #Get the id of the font, ids are given in order and never change
+    def get_font_id(self, size, weight, style):
+        key = (size, weight, style)
+        font_id = self.font_ids.get(key)
+        if font_id is None:
+            font_id = len(self.font_keys)
+            self.font_keys.append(key)
+            self.font_ids[key] = font_id
+        return font_id
+
+    #Get the font from its id
+    def font_by_id(self, font_id):
+        return self.get_font(*self.font_keys[font_id])
+
+    #Get the metrics of the font, they are computed only once
+    def get_metrics(self, size, weight, style):
+        key = (size, weight, style)
+        metrics = self.metrics.get(key)
+        if metrics is None:
+            metrics = self.backend.metrics(size, weight, style)
+            self.metrics[key] = metrics
+        return metrics
+
+    #Get the width of the word written with the font
+    def measure(self, size, weight, style, word):
+        key = (size, weight, style, word)
+        w = self.widths.get(key)
+        if w is not None:
+            self.hits += 1
+            self.widths.move_to_end(key)
+            return w
+        self.misses += 1
+        with trace.TRACER.span('measure', 'layout'):
+            w = self.backend.measure(size, weight, style, word)
+        self.widths[key] = w
+        if len(self.widths) > self.max_words:
+            self.widths.popitem(last=False) #Forget the least recently used width
+        return w
+
+    #The counters of the cache
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits, 'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'words': len(self.widths), 'fonts': len(self.font_keys)
+        }
+
+FONTS = FontCache() #The cache shared by every layout of the browser
@@ -0,0 +1,98 @@
+#The history file keeps the pages visited in a tab for back/forward navigation
+#Recent pages keep a snapshot of their tree and layout so going back doesn't fetch, parse and lay them out again
+
+import collections
+import itertools
+
+#One visited page
+class HistoryEntry:
+    ids = itertools.count() #Gives every entry a unique id, used as the snapshot key
+
+    def __init__(self, url):
+        self.id = next(HistoryEntry.ids)
+        self.url = url #The URL object of the page
+        self.scroll = 0 #Kept even when the snapshot is evicted, so a reload goes back to the same place
+
+#Everything needed to show a page again without loading it
+class Snapshot:
+    NODE_SIZE = 120 #Rough number of bytes taken by a node (object, children list, attributes)
+
+    def __init__(self, nodes, layout, scroll, width):
+        self.nodes = nodes #The root node of the parsed tree
+        self.layout = layout #The layout, its display list is used as is if the width didn't change
+        self.scroll = scroll
+        self.width = width #The width the layout was made for
+        self.size = self.estimate_size() #Rough number of bytes kept alive by the snapshot
+
+    def estimate_size(self):
+        size = self.layout.display_list.nbytes() if self.layout is not None else 0
+        stack = [self.nodes]
+        while stack:
+            node = stack.pop()
+            size += self.NODE_SIZE + len(getattr(node, 'text', ''))
+            stack.extend(node.children)
+        return size
+
+#Back/forward list with an LRU of snapshots kept under a memory budget
+class History:
+    def __init__(self, memory_budget=64 * 1024 * 1024):
+        self.entries = [] #Visited pages in order
+        self.index = -1 #The position of the current page in entries
+        self.snapshots = collections.OrderedDict() #Dictionary of entry id -> snapshot, the most recently used are at the end
+        self.memory_budget = memory_budget #The max number of bytes of snapshots kept
+        self.memory_used = 0
+
+    def current(self):
+        return self.entries[self.index] if self.index >= 0 else None
+
+    #Adds a new page after the current one, pages that were forward of it are dropped
+    def visit(self, url):
+        for entry in self.entries[self.index + 1:]:
+            self.drop(entry)
+        del self.entries[self.index + 1:]
+        entry = HistoryEntry(url)
+        self.entries.append(entry)
+        self.index += 1
+        return entry
+
+    def can_go_back(self):
+        return self.index > 0
+
+    def can_go_forward(self):
+        return self.index < len(self.entries) - 1
+
+    #Moves to the previous page and returns its entry
+    def back(self):
+        if not self.can_go_back(): return None
+        self.index -= 1
+        return self.entries[self.index]
+
+    #Moves to the next page and returns its entry
+    def forward(self):
+        if not self.can_go_forward(): return None
+        self.index += 1
+        return self.entries[self.index]
+
+    #Stores the snapshot of the entry and evicts the least recently used snapshots above the budget
+    def save(self, entry, snapshot):
+        entry.scroll = snapshot.scroll
+        self.drop(entry)
+        if snapshot.size > self.memory_budget: return #It would evict everything else and then itself
+        self.snapshots[entry.id] = snapshot
+        self.memory_used += snapshot.size
+        while self.memory_used > self.memory_budget:
+            entry_id, evicted = self.snapshots.popitem(last=False)
+            self.memory_used -= evicted.size
+
+    #Get the snapshot of the entry, or None if it was evicted and the page has to be loaded again
+    def restore(self, entry):
+        snapshot = self.snapshots.get(entry.id)
+        if snapshot is not None:
+            self.snapshots.move_to_end(entry.id)
+        return snapshot
+
+    #Forgets the snapshot of the entry
+    def drop(self, entry):
+        snapshot = self.snapshots.pop(entry.id, None)
+        if snapshot is not None:
+            self.memory_used -= snapshot.size
@@ -1,8 +1,17 @@
+import re
+import sys
+import types
+from . import trace as trace
+
+EMPTY_ATTRIBUTES = types.MappingProxyType({}) #Shared by every element without attributes, it can't be changed by mistake
+
 #Represents the text in between tags
 class Text:
+    __slots__ = ('text', 'parent') #No per-node __dict__, pages can have a lot of nodes
+    children = () #Text has no children but is present due to consistancy
+
     def __init__(self, text, parent):
         self.text = text
-        self.children = [] #Text has no children but is present due to consistancy
         self.parent = parent
     
     #Method for printing the text
@@ -11,11 +20,14 @@ class Text:
 
 #Represents the tags of the HTML code
 class Element:
+    __slots__ = ('tag', 'attributes', 'children', 'parent', 'style')
+
     def __init__(self, tag, attributes, parent):
         self.tag = tag
         self.attributes = attributes #Some tags can have attributes like ids, classes...
         self.children = []
         self.parent = parent
+        self.style = None #The computed style, set by the css module
 
     #Method for printing the tags
     def __repr__(self):
@@ -23,72 +35,107 @@ class Element:
 
 #Represents the HTML parser
 class HTMLParser:
+    TAG_RE = re.compile(r'<([^<>]*)>') #Matches a whole tag, the group being what's in between the brackets
+
+    SELF_CLOSING_TAGS = frozenset([
+        'area', 'base', 'br', 'col', 'embed', 'hr', 'img',
+        'input', 'link', 'meta', 'param', 'source', 'track',
+        'wbr' 
+    ])
+    HEAD_TAGS = frozenset([
+        'base', 'basefont', 'bgsound', 'noscript', 'link',
+        'meta', 'title', 'style', 'script'
+    ])
+    #Insertion modes, they tell which implicit tags can be needed next
+    INITIAL = 0 #No tag is open
+    IN_HTML = 1 #Only <html> is open
+    IN_HEAD = 2 #Only <html> and <head> are open
+    IN_CONTENT = 3 #Anything else, no tag gets added implicitly
+    HTML_EXITS = frozenset(['head', 'body', '/html']) #Tags that don't need <head> or <body> to be added
+    HEAD_EXITS = HEAD_TAGS | frozenset(['/head']) #Tags that don't close <head> implicitly
+
     def __init__(self, body):
         self.body = body #HTML code
         self.unfinished = [] #Tags yet to be closed during parsing
-        self.SELF_CLOSING_TAGS = [
-            'area', 'base', 'br', 'col', 'embed', 'hr', 'img',
-            'input', 'link', 'meta', 'param', 'source', 'track',
-            'wbr' 
-        ]
-        self.HEAD_TAGS = [
-            'base', 'basefont', 'bgsound', 'noscript', 'link',
-            'meta', 'title', 'style', 'script'
-        ]
+        self.mode = self.INITIAL #The insertion mode, updated every time unfinished changes
+        self.pending = [] #Chunks fed to the parser that don't end with a finished tag yet
 
     #Logic behind parsing
     def parse(self):
-        text = ''
-        in_tag = False
-        for c in self.body: #Read from body
-            if c == '<': #If in an open tag
-                in_tag = True 
-                if text: self.add_text(text) #Add text element
-                text = ''
-            elif c == '>':
-                in_tag = False
-                self.add_tag(text) #Add node element
-                text = ''
-            else:
-                text += c
-        if not in_tag and text:
+        with trace.TRACER.span('parse', 'parse', size=len(self.body)):
+            self.feed(self.body) #The whole body is just one big chunk
+            return self.close() #Finish the parsing tree
+
+    #Feed a chunk of HTML code to the parser, chunks can be split anywhere (even in the middle of a tag)
+    def feed(self, chunk):
+        self.pending.append(chunk)
+        if '>' not in chunk: return #No tag can be finished by this chunk, so wait for more data
+        data = ''.join(self.pending)
+        pos = 0
+        for match in self.TAG_RE.finditer(data): #Find every finished tag
+            text = data[pos:match.start()]
+            if text: self.add_text(text) #Add text element
+            self.add_tag(match.group(1)) #Add node element
+            pos = match.end()
+        self.pending = [data[pos:]] if pos < len(data) else [] #Keep the unfinished rest for the next chunk
+
+    #Tells the parser there's no more data and returns the root node
+    def close(self):
+        text = ''.join(self.pending)
+        self.pending = []
+        if '<' in text:
+            text = text[:text.index('<')] #An unfinished tag at the end gets dropped
+        if text:
             self.add_text(text) #If at end and there's text, add text
-        return self.finish() #Finish the parsing tree
+        return self.finish()
     
     #Handle if some tags have been omitted
     def implicit_tags(self, tag):
         while True:
-            open_tags = [node.tag for node in self.unfinished]
-            if open_tags == [] and tag != 'html':
+            mode = self.mode
+            if mode == self.INITIAL and tag != 'html':
                 self.add_tag('html')
-            elif open_tags == ['html'] and tag not in \
-            ['head', 'body', '/html']:
+            elif mode == self.IN_HTML and tag not in self.HTML_EXITS:
                 if tag in self.HEAD_TAGS:
                     self.add_tag('head')
                 else:
                     self.add_tag('body')
-            elif open_tags == ['html', 'head'] and \
-            tag not in ['/head'] + self.HEAD_TAGS:
+            elif mode == self.IN_HEAD and tag not in self.HEAD_EXITS:
                 self.add_tag('/head')
             else:
                 break
 
+    #Find the insertion mode from the open tags, only the first two can matter so this is O(1)
+    def update_mode(self):
+        unfinished = self.unfinished
+        depth = len(unfinished)
+        if depth == 0:
+            self.mode = self.INITIAL
+        elif depth == 1 and unfinished[0].tag == 'html':
+            self.mode = self.IN_HTML
+        elif depth == 2 and unfinished[0].tag == 'html' and unfinished[1].tag == 'head':
+            self.mode = self.IN_HEAD
+        else:
+            self.mode = self.IN_CONTENT
+
     def add_text(self, text):
         if text.isspace(): return
-        self.implicit_tags(None)
+        if self.mode != self.IN_CONTENT: self.implicit_tags(None)
         parent = self.unfinished[-1]
         node = Text(text, parent)
         parent.children.append(node)
 
     def add_tag(self, tag):
+        if not tag.strip(): return #Skip empty tags like <>
         tag, attributes = self.get_attributes(tag) #Get attributes of tags
         if tag.startswith('!'): return
-        self.implicit_tags(tag) #Skip tag that start with !
+        if self.mode != self.IN_CONTENT: self.implicit_tags(tag) #Skip tag that start with !
         if tag.startswith('/'): #Handle finishing tags
             if len(self.unfinished) == 1: return
             node = self.unfinished.pop()
             parent = self.unfinished[-1]
             parent.children.append(node)
+            if len(self.unfinished) <= 2: self.update_mode()
         elif tag in self.SELF_CLOSING_TAGS:
             parent = self.unfinished[-1]
             node = Element(tag, attributes, parent)
@@ -97,6 +144,7 @@ class HTMLParser:
             parent = self.unfinished[-1] if self.unfinished else None
             node = Element(tag, attributes, parent)
             self.unfinished.append(node)
+            if len(self.unfinished) <= 3: self.update_mode()
 
     #Method to finish the parse tree
     def finish(self):
@@ -109,22 +157,64 @@ class HTMLParser:
         return self.unfinished.pop() #Return last tag
     
     #Get attributes by spliting the tag by spaces and store the key=value into a dictionary 
+    #Tag names and attribute names are interned so that every node with the same tag shares one string
     def get_attributes(self, text):
         parts = text.split()
-        tag = parts[0].casefold()
+        tag = sys.intern(parts[0].casefold())
+        if len(parts) == 1:
+            return tag, EMPTY_ATTRIBUTES
         attributes = {}
         for attrpair in parts[1:]:
             if '=' in attrpair:
                 key, value = attrpair.split('=', 1)
                 if len(value) > 2 and value[0] in ['\'', '"']:
                     value = value[1:-1]
-                attributes[key.casefold()] = value
+                attributes[sys.intern(key.casefold())] = value
             else: #Handle attributes that don't need value like 'disabled'
-                attributes[attrpair.casefold()] = ''
+                attributes[sys.intern(attrpair.casefold())] = ''
         return tag, attributes
     
     #Recursively print the tree
     def print_tree(self, node, indent=0):
         print(' ' * indent, node)
         for child in node.children:
-            self.print_tree(child, indent + 2)
\ No newline at end of file
+            self.print_tree(child, indent + 2)
+
+#Turns the tree into a flat list so it can be sent to another process cheaply and without deep recursion
+#Texts are stored as strings and elements as (tag, attributes or None, number of children, style), in depth-first order
+#Elements sharing a style object still share it once unpickled
+def serialize_tree(root):
+    payload = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Text):
+            payload.append(node.text)
+        else:
+            payload.append((node.tag, dict(node.attributes) if node.attributes else None, len(node.children), node.style))
+            stack.extend(reversed(node.children))
+    return payload
+
+#Builds the tree back from the list made by serialize_tree
+def deserialize_tree(payload):
+    root = None
+    stack = [] #Open elements with the number of children they still need
+    for item in payload:
+        parent = stack[-1][0] if stack else None
+        if isinstance(item, str):
+            node = Text(item, parent)
+            remaining = 0
+        else:
+            tag, attributes, remaining, style = item
+            node = Element(sys.intern(tag), attributes if attributes else EMPTY_ATTRIBUTES, parent)
+            node.style = style
+        if parent is None:
+            root = node
+        else:
+            parent.children.append(node)
+            stack[-1][1] -= 1
+        if remaining:
+            stack.append([node, remaining])
+        while stack and stack[-1][1] == 0: #Close the elements that got all their children
+            stack.pop()
+    return root
@@ -0,0 +1,153 @@
+#The images file loads the images of pages in the background and keeps the decoded ones in a memory bounded cache
+#Fetching happens on worker threads, only the Tk decoding runs on the Tkinter thread since Tk isn't thread-safe
+
+import base64
+import collections
+import concurrent.futures
+import math
+import queue
+import struct
+import threading
+import tkinter as tk
+from . import network as network
+from . import trace as trace
+
+#Get the natural (width, height) from the header of a PNG or GIF, None for other formats
+#Read on the worker thread so the Tkinter thread knows the size before decoding
+def image_size(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    return None
+
+FETCH_TIMEOUT = 10 #Seconds an image host can stall before the fetch fails, so hung hosts can't hold the shared threads
+
+#Runs on a worker thread: fetch the image, returns its size and its data encoded for Tk
+def fetch_image(url):
+    with trace.TRACER.span('image', 'network', url=url):
+        socket = network.Socket(network.URL(url), timeout=FETCH_TIMEOUT)
+        data = socket.load_bytes()
+    if socket.status not in (None, 200):
+        raise ValueError('Image not found: {} {}'.format(socket.status, url))
+    size = image_size(data)
+    if size is None:
+        raise ValueError('Unsupported image format: {}'.format(url)) #Tk only decodes PNG and GIF
+    return size, base64.b64encode(data) #Base64 is what Tk expects, encoding it here keeps it off the Tkinter thread
+
+#LRU of decoded images keyed by URL and box size, bounded by the memory the pixels take
+#Views keep their own reference to the images they draw, so an evicted image stays on the canvas until the view moves on
+class ImageCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.images = collections.OrderedDict() #Dictionary of (url, width, height) -> PhotoImage, the least recently used first
+        self.used = 0 #Bytes taken by the cached images, 4 per pixel
+
+    def get(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        self.remove(key)
+        self.images[key] = image
+        self.used += self.image_bytes(image)
+        while self.used > self.max_bytes and len(self.images) > 1: #Keep at least the image just added
+            old_key, old_image = self.images.popitem(last=False)
+            self.used -= self.image_bytes(old_image)
+
+    def remove(self, key):
+        image = self.images.pop(key, None)
+        if image is not None:
+            self.used -= self.image_bytes(image)
+
+    def image_bytes(self, image):
+        return image.width() * image.height() * 4
+
+    def clear(self):
+        self.images.clear()
+        self.used = 0
+
+    def stats(self):
+        return {'images': len(self.images), 'bytes': self.used}
+
+IMAGES = ImageCache() #Shared decoded image cache
+
+EXECUTOR = None #The threads fetching images for every view, created on the first image
+EXECUTOR_LOCK = threading.Lock()
+
+def get_executor():
+    global EXECUTOR
+    with EXECUTOR_LOCK:
+        if EXECUTOR is None:
+            EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='images')
+        return EXECUTOR
+
+#Loads images in the background for a view and decodes them on the Tkinter thread, every view has its own
+class ImageLoader:
+    def __init__(self, root, on_loaded, cache=IMAGES, poll_interval=20, executor=None):
+        self.root = root #The Tkinter window, used to schedule the polling of results and as the master of the images
+        self.on_loaded = on_loaded #Called with the key when an image got in the cache
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.executor = executor #Where fetch_image runs, the shared thread pool if None
+        self.results = queue.Queue() #Fetched images waiting to be decoded on the Tkinter thread
+        self.pending = {} #Dictionary of key -> future of the images being fetched
+        self.failed = set() #Keys of images that couldn't be loaded, they aren't fetched again
+        self.poll_job = None #The pending poll on the Tkinter thread
+        self.DECODES_PER_POLL = 2 #Images decoded at a time, so a page full of images doesn't freeze the GUI
+
+    #Starts loading the image for the box if it isn't cached, loading or failed
+    def request(self, url, width, height):
+        key = (url, width, height)
+        if key in self.pending or key in self.failed or self.cache.get(key) is not None: return
+        executor = self.executor if self.executor is not None else get_executor()
+        future = executor.submit(fetch_image, url)
+        future.add_done_callback(lambda future: self.results.put((key, future)))
+        self.pending[key] = future
+        if self.poll_job is None:
+            self.poll_job = self.root.after(self.poll_interval, self.poll)
+
+    #Stops the loads that didn't start yet, used when the view shows another page
+    def cancel(self):
+        for key, future in list(self.pending.items()):
+            if future.cancel():
+                del self.pending[key]
+
+    #Stops loading and polling, used when the view is destroyed
+    def close(self):
+        self.cancel()
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    #Runs on the Tkinter thread: decodes a few fetched images and keeps polling while some are loading
+    def poll(self):
+        self.poll_job = None
+        for _ in range(self.DECODES_PER_POLL):
+            try:
+                key, future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.pop(key, None)
+            if future.cancelled(): continue
+            try:
+                size, data = future.result()
+                with trace.TRACER.span('decode', 'render', url=key[0]):
+                    image = self.decode(data, size, key[1], key[2])
+            except Exception: #Any broken image (like a zlib.error from a corrupt PNG) must not stop the others from loading
+                self.failed.add(key)
+                continue
+            self.cache.put(key, image)
+            self.on_loaded(key)
+        if self.pending or not self.results.empty():
+            self.poll_job = self.root.after(self.poll_interval, self.poll)
+
+    #Makes the Tk image, shrunk by a whole factor so it fits in the box (Tk can only subsample by integers)
+    def decode(self, data, size, width, height):
+        image = tk.PhotoImage(master=self.root, data=data)
+        factor = max(1, math.ceil(size[0] / max(width, 1)), math.ceil(size[1] / max(height, 1)))
+        if factor > 1:
+            image = image.subsample(factor)
+        return image
@@ -0,0 +1,167 @@
+#The loader file fetches pages on a thread and parses them in worker processes so that the GUI never freezes during loads
+#The network stays in the GUI process so every tab shares its connection pool, DNS and TLS caches, response cache and tracer
+#Several tabs can parse at once on different cores, only a compact serialized tree is sent back to the GUI process
+
+import concurrent.futures
+import multiprocessing
+import queue
+import threading
+from . import network as network
+from . import htmlparser as htmlp
+from . import css as css
+from . import trace as trace
+
+PARSE_CHUNK = 64 * 1024 #The number of characters fed to the parser at a time
+
+#Runs in a worker process: parse and style the page, returns the tree as a flat list with the spans recorded while doing it
+#The page is either its content or, for local files, their URL so they're read here in chunks and never held by the GUI process
+#stylesheets is a dictionary of href -> (url, text) of the linked stylesheets, already loaded by the GUI process
+def parse_page(content, file_url, stylesheets, tracing):
+    tracer = trace.TRACER
+    tracer.clear()
+    tracer.enable() if tracing else tracer.disable() #The worker's tracer follows the GUI's
+    parser = htmlp.HTMLParser('')
+    if file_url is not None:
+        chunks = network.Socket(network.URL(file_url)).iter_file()
+    else:
+        chunks = (content[i:i + PARSE_CHUNK] for i in range(0, len(content), PARSE_CHUNK))
+    for chunk in chunks:
+        with tracer.span('parse', 'parse'):
+            parser.feed(chunk)
+    with tracer.span('parse', 'parse'):
+        nodes = parser.close()
+    css.style_tree(nodes, stylesheets.get) #The computed styles are sent with the tree
+    return htmlp.serialize_tree(nodes), list(tracer.events), dict(tracer.counters)
+
+#Yields the chunks of a page and adds the href of its stylesheet links to hrefs, without joining the chunks
+#A tag split between two chunks is carried over to the next one
+def scan_stylesheet_links(chunks, hrefs):
+    tail = ''
+    for chunk in chunks:
+        text = tail + chunk
+        split = text.rfind('<')
+        if split <= text.rfind('>'): split = len(text) #The last tag is complete
+        hrefs.extend(css.find_stylesheet_links(text[:split]))
+        tail = text[split:]
+        yield chunk
+    hrefs.extend(css.find_stylesheet_links(tail))
+
+#Loads a linked stylesheet, returns its URL and text or None if it can't be loaded, the page is still shown without it
+def load_stylesheet(page_url, href):
+    try:
+        url = page_url.resolve(href)
+        with trace.TRACER.span('stylesheet', 'network', url=str(url)):
+            socket = network.Socket(url)
+            text = socket.load_content()
+        if socket.status not in (None, 200): return None #An error page isn't a stylesheet, file URLs have no status
+        return str(url), text
+    except (OSError, ValueError, AssertionError, UnicodeError):
+        return None
+
+EXECUTOR = None #The process pool shared by every loader, created on the first load
+EXECUTOR_LOCK = threading.Lock()
+
+#Get the shared process pool, processes are spawned instead of forked so they don't inherit the Tkinter state
+def get_executor():
+    global EXECUTOR
+    with EXECUTOR_LOCK:
+        if EXECUTOR is None:
+            EXECUTOR = concurrent.futures.ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+        return EXECUTOR
+
+#Loads pages in the background and hands the results back to the Tkinter thread, every tab has its own loader
+class Loader:
+    def __init__(self, root, poll_interval=20, executor=None):
+        self.root = root #The Tkinter window, used to schedule the polling of results
+        self.poll_interval = poll_interval #Milliseconds between checks for finished loads
+        self.executor = executor #Where parse_page runs, the shared process pool if None
+        self.results = queue.Queue() #Finished loads waiting to be handed to the Tkinter thread
+        self.generation = 0 #Increased on every load, results of older loads get dropped
+        self.cancelled = threading.Event() #Set to stop the thread of the current load
+        self.future = None #The future of the parse of the current load, once it's been fetched
+        self.loading = False #Whether a load is running
+        self.poll_job = None #The pending poll on the Tkinter thread
+
+    #Starts loading the URL, on_done(nodes) or on_error(error) gets called on the Tkinter thread
+    def load(self, url, on_done, on_error):
+        self.cancel()
+        self.generation += 1
+        self.cancelled = threading.Event()
+        worker = threading.Thread(
+            target=self.work, args=(self.generation, self.cancelled, url, on_done, on_error), daemon=True
+        )
+        worker.start()
+        self.loading = True
+        if self.poll_job is None:
+            self.poll_job = self.root.after(self.poll_interval, self.poll)
+
+    #Stops the current load, its result will never be handed back
+    #The fetch stops at the next chunk, the parse is dropped from the pool if no process started it yet
+    def cancel(self):
+        self.cancelled.set()
+        future = self.future
+        if future is not None:
+            future.cancel()
+            self.future = None
+        self.generation += 1
+        self.loading = False
+
+    #Stops polling, used when the tab is closed
+    def close(self):
+        self.cancel()
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
+
+    #Runs on the load's thread: fetch the page and its stylesheets, wait for a worker process to parse it and rebuild the tree
+    def work(self, generation, cancelled, url, on_done, on_error):
+        try:
+            file_url = str(url) if url.scheme == 'file' else None
+            chunks = [] #Only kept for network pages, local files are read again by the worker
+            hrefs = []
+            for chunk in scan_stylesheet_links(network.Socket(url).iter_content(), hrefs):
+                if cancelled.is_set(): return #Leaving the loop closes the connection
+                if file_url is None: chunks.append(chunk)
+            content = ''.join(chunks)
+            del chunks
+            stylesheets = {}
+            for href in hrefs:
+                if cancelled.is_set(): return
+                if href not in stylesheets:
+                    stylesheets[href] = load_stylesheet(url, href)
+            if cancelled.is_set(): return
+            executor = self.executor if self.executor is not None else get_executor()
+            future = executor.submit(parse_page, content, file_url, stylesheets, trace.TRACER.enabled)
+            self.future = future
+            if cancelled.is_set(): #Cancelled while submitting
+                future.cancel()
+                return
+            del content
+            payload, events, counters = future.result()
+            if cancelled.is_set(): return
+            trace.TRACER.merge(events, counters) #The parse and style spans of the worker process
+            with trace.TRACER.span('deserialize', 'parse'): #Done here so big trees don't freeze the GUI
+                nodes = htmlp.deserialize_tree(payload)
+            self.results.put((generation, nodes, None, on_done, on_error))
+        except concurrent.futures.CancelledError:
+            return
+        except Exception as error:
+            self.results.put((generation, None, error, on_done, on_error))
+
+    #Runs on the Tkinter thread: calls back for finished loads and keeps polling while loading
+    def poll(self):
+        self.poll_job = None
+        while True:
+            try:
+                generation, nodes, error, on_done, on_error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation: continue #Drop results of cancelled loads
+            self.loading = False
+            self.future = None
+            if error is not None:
+                on_error(error)
+                continue
+            on_done(nodes)
+        if self.loading:
+            self.poll_job = self.root.after(self.poll_interval, self.poll)
@@ -1,71 +1,555 @@
+import codecs
+import mmap
+import os
+import re
 import socket
 import ssl
+import threading
+import time
+import urllib.parse
+import zlib
+from . import cache as cache
+from . import trace as trace
+
+#Reads a response from a socket into a reusable preallocated buffer with recv_into, so data isn't copied again and again
+class ResponseReader:
+    def __init__(self, sock, buffer_size=64 * 1024):
+        self.socket = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0 #The unread data is buffer[start:end]
+        self.end = 0
+
+    #Receives more data after the unread data, returns the number of bytes received (0 when the connection closed)
+    def fill(self):
+        if self.start == self.end:
+            self.start = self.end = 0 #Everything was read, so the whole buffer can be used again
+        elif self.end == len(self.buffer):
+            unread = bytes(self.view[self.start:self.end])
+            if len(unread) * 2 > len(self.buffer): #A line that doesn't fit, the buffer gets replaced by a bigger one
+                self.buffer = bytearray(len(self.buffer) * 2)
+                self.view = memoryview(self.buffer)
+            self.view[:len(unread)] = unread #Move the unread data to the front
+            self.start, self.end = 0, len(unread)
+        received = self.socket.recv_into(self.view[self.end:])
+        self.end += received
+        return received
+
+    #Reads a line ending with \n, returns b'' if the connection closed before it
+    def readline(self, limit=64 * 1024):
+        while True:
+            index = self.buffer.find(b'\n', self.start, self.end)
+            if index >= 0:
+                line = bytes(self.view[self.start:index + 1])
+                self.start = index + 1
+                return line
+            if self.end - self.start > limit:
+                raise ValueError('Line too long in the response')
+            if not self.fill():
+                line = bytes(self.view[self.start:self.end])
+                self.start = self.end
+                return line
+
+    #Yields exactly n bytes in pieces, each piece is a memoryview of the buffer only valid until the next one
+    def read(self, n):
+        while n > 0:
+            if self.start == self.end and not self.fill():
+                raise ConnectionError('Connection closed before the whole body was received')
+            size = min(n, self.end - self.start)
+            yield self.view[self.start:self.start + size]
+            self.start += size
+            n -= size
+
+    #Yields pieces until the server closes the connection
+    def read_all(self):
+        while True:
+            if self.start == self.end and not self.fill(): return
+            piece = self.view[self.start:self.end]
+            self.start = self.end
+            yield piece
+
+#Turns the raw body into text: decompresses gzip/deflate and decodes the charset incrementally
+#It doesn't do any IO so the same decoding is used however the body is received
+#Binary bodies like images are only decompressed and returned as bytes
+class BodyDecoder:
+    def __init__(self, headers, sniff_size=1024, binary=False):
+        self.binary = binary
+        encoding = headers.get('content-encoding', '').casefold()
+        self.compression = encoding if encoding in ('gzip', 'x-gzip', 'deflate') else ''
+        self.decompressor = None #Created on the first data, deflate needs it to know which format is used
+        self.charset = get_content_type_charset(headers.get('content-type', ''))
+        self.decoder = None #The incremental decoder, created once the charset is known
+        self.head = b'' #Start of the body kept to find the charset from a BOM or <meta>
+        self.sniff_size = sniff_size
+
+    #Decodes a piece of the body, returns the text that can already be decoded
+    def feed(self, data):
+        if self.compression:
+            data = self.decompress(data)
+        if self.binary:
+            return bytes(data) #A copy, the data can be a view of the reader's buffer
+        if self.decoder is None:
+            self.head += data
+            if len(self.head) < self.sniff_size and self.charset is None: return ''
+            data, self.head = self.head, b''
+            self.start_decoder(data)
+            data = data[self.skip:]
+        return self.decoder.decode(data)
+
+    #Decodes what's left once the whole body was fed
+    def finish(self):
+        if self.binary:
+            return self.decompressor.flush() if self.decompressor is not None else b''
+        text = ''
+        if self.decompressor is not None:
+            rest = self.decompressor.flush()
+            if rest: text = self.feed_decompressed(rest)
+        if self.decoder is None:
+            data, self.head = self.head, b''
+            self.start_decoder(data)
+            text += self.decoder.decode(data[self.skip:])
+        return text + self.decoder.decode(b'', final=True)
+
+    def feed_decompressed(self, data):
+        compression, self.compression = self.compression, ''
+        try:
+            return self.feed(data)
+        finally:
+            self.compression = compression
+
+    def start_decoder(self, head):
+        encoding, self.skip = detect_charset(head)
+        if self.charset is not None and not self.skip:
+            encoding = self.charset #The header wins over <meta>, a BOM wins over both
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+
+    def decompress(self, data):
+        if self.decompressor is None:
+            if self.compression == 'deflate':
+                first = bytes(data[:2])
+                #Some servers send raw deflate without the zlib header
+                zlib_header = len(first) == 2 and first[0] & 0x0F == 8 and (first[0] << 8 | first[1]) % 31 == 0
+                self.decompressor = zlib.decompressobj(zlib.MAX_WBITS if zlib_header else -zlib.MAX_WBITS)
+            else:
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) #16 tells zlib to expect the gzip header
+        return self.decompressor.decompress(data)
+
+#A connection to a host that can be reused for several requests
+class Connection:
+    def __init__(self, sock):
+        self.socket = sock
+        self.reader = ResponseReader(sock) #Kept for the whole life of the connection
+
+    def close(self):
+        self.socket.close()
+
+#Keeps idle connections per (scheme, host, port) so that repeated loads from one host skip the TCP and TLS handshakes
+class ConnectionPool:
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle #The max number of idle connections kept per host
+        self.idle = {} #Dictionary of idle connections for each (scheme, host, port)
+        self.lock = threading.Lock()
+
+    #Get an idle connection for the key, or None if there isn't one
+    def acquire(self, key):
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                return connections.pop()
+        return None
+
+    #Give a connection back to the pool after its response has been fully read
+    def release(self, key, connection):
+        with self.lock:
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.max_idle:
+                connections.append(connection)
+                return
+        connection.close()
+
+    #Close every idle connection
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+#Caches hostname lookups for a while so that repeated loads from one host skip DNS
+class Resolver:
+    def __init__(self, ttl=300):
+        self.ttl = ttl #Seconds a lookup is kept
+        self.entries = {} #Dictionary of (host, port) -> (addresses, expiry time)
+        self.lock = threading.Lock()
+
+    #Get the socket addresses of the host, only looking it up if the cached ones expired
+    def resolve(self, host, port):
+        key = (host, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now < entry[1]:
+                return entry[0]
+        with trace.TRACER.span('dns', 'network', host=host):
+            addresses = socket.getaddrinfo(host, port, family=socket.AF_INET, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP)
+        with self.lock:
+            self.entries[key] = (addresses, now + self.ttl)
+        return addresses
+
+    #Forget the addresses of the host, used when none of them could be connected to
+    def forget(self, host, port):
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+#Shares one SSL context and keeps a TLS session per host so that reconnecting can skip the full handshake
+class TLSSessions:
+    def __init__(self, context=None):
+        self.context = context #Created the first time it's needed, loading the CA store is slow
+        self.sessions = {} #Dictionary of (host, port) -> last TLS session
+        self.lock = threading.Lock()
+        self.resumed = 0 #Handshakes that reused a session
+        self.full = 0 #Full handshakes
+
+    def get_context(self):
+        with self.lock:
+            if self.context is None:
+                self.context = ssl.create_default_context() #Manages the SSL protocol for HTTPS requests
+            return self.context
+
+    #Does the TLS handshake on the socket, resuming the host's last session if there is one
+    def wrap(self, sock, host, port):
+        context = self.get_context()
+        with self.lock:
+            session = self.sessions.get((host, port))
+        try:
+            with trace.TRACER.span('tls', 'network', host=host, resumed=session is not None):
+                tls_socket = context.wrap_socket(sock, server_hostname=host, session=session)
+        except ssl.SSLError:
+            self.forget(host, port) #Don't offer the session again if the server didn't accept it
+            raise
+        with self.lock:
+            if tls_socket.session_reused:
+                self.resumed += 1
+            else:
+                self.full += 1
+        self.save(tls_socket, host, port)
+        return tls_socket
+
+    #Remember the session of the socket, with TLS 1.3 it is only known after some data was received
+    def save(self, tls_socket, host, port):
+        session = tls_socket.session
+        if session is not None:
+            with self.lock:
+                self.sessions[(host, port)] = session
+
+    def forget(self, host, port):
+        with self.lock:
+            self.sessions.pop((host, port), None)
+
+POOL = ConnectionPool() #The pool shared by every socket of the browser
+RESOLVER = Resolver() #The DNS cache shared by every socket of the browser
+TLS = TLSSessions() #The SSL context and TLS sessions shared by every socket of the browser
+CACHE = cache.ResponseCache() #The HTTP cache shared by every socket of the browser
+
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_.:-]+)', re.IGNORECASE) #Finds <meta charset> in the start of a page
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'), (codecs.BOM_UTF16_LE, 'utf-16-le'), (codecs.BOM_UTF16_BE, 'utf-16-be')
+]
+
+#Finds the encoding of a page from its first bytes, returns the encoding and the length of the BOM to skip
+def detect_charset(head, default='utf-8'):
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    match = META_CHARSET_RE.search(head)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode('ascii')).name, 0
+        except LookupError:
+            pass #Unknown charsets fall back to the default
+    return default, 0
+
+#Get the charset given in a Content-Type header (text/html; charset=utf-8), or None
+def get_content_type_charset(content_type):
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().casefold() == 'charset':
+            try:
+                return codecs.lookup(value.strip().strip('"\'')).name
+            except LookupError:
+                return None
+    return None
+
+#Splits a status line (HTTP/1.1 200 OK) into the version and the status code
+def parse_status_line(line):
+    version, status, explanation = (line.decode('iso-8859-1').split(' ', 2) + [''])[:3]
+    return version, int(status)
+
+#Splits a header line (Content-Type: text/html) into the casefolded name and the value
+def parse_header_line(line):
+    header, value = line.decode('iso-8859-1').split(':', 1)
+    return header.casefold(), value.strip()
+
+#Get how the body of the response is delimited: ('none', 0), ('chunked', 0), ('length', n) or ('close', 0)
+def body_framing(status, headers):
+    if status in (204, 304) or 100 <= status < 200:
+        return 'none', 0 #These responses never have a body
+    if 'chunked' in headers.get('transfer-encoding', '').casefold():
+        return 'chunked', 0
+    if 'content-length' in headers:
+        return 'length', int(headers['content-length'])
+    return 'close', 0 #Without framing the body ends when the server closes the connection
+
+#Get the size of the chunk from the line starting it, chunk extensions are skipped
+def parse_chunk_size(line):
+    return int(line.split(b';', 1)[0].strip(), 16)
+
+#Makes the bytes of a GET request for the path
+def build_request(path, headers):
+    request = 'GET {} HTTP/1.1\r\n'.format(path)
+    for key, val in headers.items():
+        request += '{}: {}\r\n'.format(key, val)
+    request += '\r\n'
+    return request.encode('utf8')
+
+#Whether the connection can be used for another request once the body was read
+def is_reusable(version, headers):
+    connection = headers.get('connection', '').casefold()
+    if version == 'HTTP/1.0':
+        return connection == 'keep-alive'
+    return connection != 'close'
 
 #Class for defining a socket
 class Socket:
-    def __init__(self, url):
+    def __init__(self, url, pool=POOL, cache=CACHE, resolver=RESOLVER, tls=TLS, timeout=None):
         self.url = url
-        #The default socket has:
-        self.socket = socket.socket(
-            family=socket.AF_INET, #Is a socket to the web
-            type=socket.SOCK_STREAM, #Is a stream of unset size
-            proto=socket.IPPROTO_TCP #Uses the TCP protocol
-        )
+        self.timeout = timeout #Seconds a connect or a read can wait before failing, None waits forever
+        self.pool = pool #Where connections are taken from and given back to
+        self.resolver = resolver #Where host addresses are looked up
+        self.tls = tls #Where the SSL context and TLS sessions come from
+        self.cache = cache #Where responses are looked up before going to the network, None to skip it
+        self.key = (url.scheme, url.host, url.get_port()) if url.scheme != 'file' else None
+        self.connection = None
+        self.socket = None
+        self.reused = False #Whether the connection came from the pool
         self.headers = {} #Dictionary of request headers
         self.fill_headers()
+        self.status = None #The status code of the last response
+        self.version = None #The HTTP version of the last response
+        self.response_headers = {} #Dictionary of response headers
+        self.CHUNK_SIZE = 64 * 1024 #The number of bytes decoded at a time when streaming content
+        self.MMAP_THRESHOLD = 1024 * 1024 #Files bigger than this are memory-mapped instead of read at once
 
     #Method for setting up headers
     def fill_headers(self):
         self.headers['Host'] = self.url.host
-        self.headers['Connection'] = 'close'
+        self.headers['Connection'] = 'keep-alive'
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+
+    #Connects the program to a distant device, reusing an idle connection if there is one
+    def connect(self, reuse=True):
+        self.connection = self.pool.acquire(self.key) if reuse else None
+        self.reused = self.connection is not None
+        trace.TRACER.count('pooled_connections' if self.reused else 'new_connections')
+        if not self.reused:
+            host, port = self.url.host, self.url.get_port()
+            sock = self.open_socket(host, port)
+            if self.url.scheme == 'https':
+                try:
+                    sock = self.tls.wrap(sock, host, port)
+                except BaseException:
+                    sock.close()
+                    raise
+            self.connection = Connection(sock)
+        self.socket = self.connection.socket
+        self.socket.settimeout(self.timeout) #Pooled connections keep the timeout of their last user otherwise
 
-    #Connects the program to a distant device
-    def connect(self):
-        self.socket.connect((self.url.host, self.url.get_port()))
-        if self.url.scheme == 'https':
-            ctx = ssl.create_default_context() #Manages the SSL protocol for HTTPS requests
-            self.socket = ctx.wrap_socket(self.socket, server_hostname=self.url.host)
+    #Opens a TCP socket to the first address of the host that accepts the connection
+    def open_socket(self, host, port):
+        error = None
+        for family, type, proto, canonname, address in self.resolver.resolve(host, port):
+            #The default socket has:
+            sock = socket.socket(
+                family=family, #Is a socket to the web
+                type=type, #Is a stream of unset size
+                proto=proto #Uses the TCP protocol
+            )
+            sock.settimeout(self.timeout)
+            try:
+                with trace.TRACER.span('connect', 'network', host=host):
+                    sock.connect(address)
+                return sock
+            except OSError as e:
+                sock.close()
+                error = e
+        self.resolver.forget(host, port) #The cached addresses may be outdated
+        raise error if error is not None else OSError('No address found for {}'.format(host))
 
     #Handles the request
     def request(self):
-        request = 'GET {} HTTP/1.1\r\n'.format(self.url.path)
-        for key, val in self.headers.items():
-            request += '{}: {}\r\n'.format(key, val)
-        request += '\r\n'
-        self.socket.send(request.encode('utf8'))
-
-    #Manages the response of the server
-    def response(self):
-        response = self.socket.makefile('r', encoding='utf8', newline='\r\n') #The recieved content gets cached
-        #This reads from the response header
-        statusline = response.readline()
-        version, status, explanation = statusline.split(' ', 2)
+        request = build_request(self.url.path, self.headers)
+        with trace.TRACER.span('request', 'network', url=str(self.url)):
+            self.socket.sendall(request)
+
+    #Reads the status line and the headers of the response
+    def read_head(self):
+        reader = self.connection.reader
+        with trace.TRACER.span('ttfb', 'network'): #Time until the server starts answering
+            statusline = reader.readline()
+        if not statusline:
+            raise ConnectionError('Connection closed by the server') #Happens when a pooled connection went stale
+        self.version, self.status = parse_status_line(statusline)
         response_headers = {}
         while True:
-            line = response.readline()
-            if line == '\r\n': break #Read while there is an empty line
-            header, value = line.split(':', 1)
-            response_headers[header.casefold()] = value.strip()
+            line = reader.readline()
+            if line in (b'\r\n', b'\n', b''): break #Read while there is an empty line
+            header, value = parse_header_line(line)
+            response_headers[header] = value
+        self.response_headers = response_headers
 
-        assert 'transfer-encoding' not in response_headers
-        assert 'content-encoding' not in response_headers
+    #Yields the body as decoded text chunks (bytes if binary), the connection goes back to the pool once the whole body was read
+    def iter_body(self, binary=False):
+        try:
+            decoder = BodyDecoder(self.response_headers, binary=binary)
+            pieces, reusable = self.read_body(self.connection.reader, self.response_headers)
+            done = False
+            while not done:
+                #Only reading and decoding a piece is timed, not what the caller does with the text in between
+                with trace.TRACER.span('body', 'network'):
+                    piece = next(pieces, None)
+                    if piece is None:
+                        done = True
+                        text = decoder.finish()
+                    else:
+                        trace.TRACER.count('network_bytes', len(piece))
+                        text = decoder.feed(piece)
+                if text: yield text
+        except BaseException:
+            self.close_connection() #Never put a half read connection back in the pool
+            raise
+        #Keep the connection open for the next request if the server allows it
+        reusable = reusable and is_reusable(self.version, self.response_headers)
+        if isinstance(self.socket, ssl.SSLSocket):
+            self.tls.save(self.socket, self.url.host, self.url.get_port()) #TLS 1.3 sends the session after the handshake
+        if reusable:
+            self.pool.release(self.key, self.connection)
+        else:
+            self.connection.close() #Closes the socket
+        self.connection = None
+
+    #Get an iterator over the raw body pieces based on the framing, and whether the connection can be used again
+    def read_body(self, reader, response_headers):
+        framing, length = body_framing(self.status, response_headers)
+        if framing == 'none':
+            return iter(()), True
+        if framing == 'chunked':
+            return self.read_chunked(reader), True
+        if framing == 'length':
+            return reader.read(length), True
+        return reader.read_all(), False
+
+    #Reads a body sent in chunks, each chunk starts with its size in hex and the body ends with a chunk of size 0
+    def read_chunked(self, reader):
+        while True:
+            line = reader.readline()
+            if not line:
+                raise ConnectionError('Connection closed in the middle of a chunked body')
+            size = parse_chunk_size(line)
+            if size == 0: break
+            yield from reader.read(size)
+            reader.readline() #Skip the \r\n after the chunk
+        while reader.readline() not in (b'\r\n', b'\n', b''): pass #Skip trailer headers
 
-        content = response.read() #Loads the HTML code
-        self.socket.close() #Closes the socket
-        
-        return content #Return the HTML code
-    
     #Logic used to link the networking with the GUI
     def load_content(self):
-        text = ''
-        #Future support to render files
-        if self.url.scheme != 'file':
-            self.connect() #Connect to source
+        return ''.join(self.iter_content()) #Return HTML
+
+    #Get the content as an iterator of decoded chunks, so the parser can start before everything is loaded
+    #Responses go through the cache when there is one
+    def iter_content(self):
+        if self.url.scheme == 'file':
+            yield from self.iter_file()
+            return
+        if self.cache is None:
+            yield from self.stream_network()
+            return
+        key = str(self.url)
+        entry = self.cache.lookup(key)
+        if entry is not None and entry.is_fresh():
+            trace.TRACER.count('cache_hits')
+            self.cache.hit(entry)
+            yield entry.body
+            return
+        if entry is not None and entry.can_revalidate():
+            #Ask the server to only send the body if it changed
+            if entry.etag: self.headers['If-None-Match'] = entry.etag
+            if entry.last_modified: self.headers['If-Modified-Since'] = entry.last_modified
+        start = time.perf_counter()
+        chunks = [] #Kept to store the body in the cache
+        for text in self.stream_network():
+            chunks.append(text)
+            if self.status != 304: yield text
+        if self.status == 304 and entry is not None:
+            self.cache.revalidated(key, entry, self.response_headers, time.perf_counter() - start)
+            yield entry.body
+            return
+        self.cache.miss()
+        if self.status == 200:
+            self.cache.store(key, ''.join(chunks), self.response_headers, time.perf_counter() - start)
+
+    #Reads a local file in chunks, big files are memory-mapped so only the chunk being decoded is copied in memory
+    def iter_file(self):
+        with open(self.url.file_path(), 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0: return
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size >= self.MMAP_THRESHOLD else file.read()
+            try:
+                encoding, start = detect_charset(data[:1024])
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace') #Handles characters split between chunks
+                for i in range(start, size, self.CHUNK_SIZE):
+                    text = decoder.decode(data[i:i + self.CHUNK_SIZE])
+                    if text: yield text
+                text = decoder.decode(b'', final=True)
+                if text: yield text
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+
+    #Gets the content from the network as decoded chunks
+    def stream_network(self, binary=False):
+        try:
+            self.open_response()
+        except OSError:
+            if not self.reused: raise
+            self.open_response(reuse=False) #The pooled connection went stale, so retry on a fresh one
+        yield from self.iter_body(binary)
+
+    #Get the content as bytes without decoding it, used for images
+    #The response cache only stores text, so binary content always comes from the network or the disk
+    def load_bytes(self):
+        if self.url.scheme == 'file':
+            with open(self.url.file_path(), 'rb') as file:
+                return file.read()
+        return b''.join(self.stream_network(binary=True))
+
+    #Connects, sends the request and reads the head of the response
+    def open_response(self, reuse=True):
+        try:
+            self.connect(reuse) #Connect to source
             self.request() #Send the request
-            text = self.response() #Get the HTML code
-        else:
-            text = '2'
-        return text #Return HTML
+            self.read_head()
+        except BaseException:
+            self.close_connection()
+            raise
+
+    def close_connection(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
 
 #Class to operate on the URL
 class URL:
@@ -94,12 +578,40 @@ class URL:
         str += self.path
         return str
     
+    #Get the URL of a link found on this page, href can be absolute (http://...), scheme-relative (//host/...), host-relative (/...) or relative
+    def resolve(self, href):
+        if '://' in href:
+            return URL(href)
+        if href.startswith('//'):
+            return URL(self.scheme + ':' + href)
+        if not href.startswith('/'):
+            directory = self.path.rsplit('/', 1)[0]
+            while True:
+                if href.startswith('./'):
+                    href = href[2:]
+                elif href.startswith('../'):
+                    href = href[3:]
+                    directory = directory.rsplit('/', 1)[0]
+                else:
+                    break
+            href = directory + '/' + href
+        host = self.host + (':' + self.port if self.port else '')
+        return URL(self.scheme + '://' + host + href)
+
+    #Get the path of a local file, file://dir/page.html is relative and file:///dir/page.html is absolute
+    def file_path(self):
+        path = self.host + self.path if self.host else self.path
+        if self.host and self.path == '/':
+            path = self.host
+        return urllib.parse.unquote(path)
+
     #Get the port of the address
     def get_port(self):
         #If the port isn't se manual, get it based on the URL scheme
+        #The default isn't stored in the URL, so it's still shown and cached the way it was typed
         if self.port == '':
             if self.scheme == 'http':
-                self.port = '80'
+                return 80
             elif self.scheme == 'https':
-                self.port = '443'
+                return 443
         return int(self.port)
\ No newline at end of file
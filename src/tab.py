@@ -0,0 +1,109 @@
+#The tab file holds the state of one browser tab: its view, its history and its loads
+
+from . import view as view
+from . import loader as loader
+from . import history as history
+from . import trace as trace
+
+#A tab of the browser, background tabs load but don't lay out or render until they're selected
+class Tab:
+    def __init__(self, browser, width, height, snapshot_budget):
+        self.browser = browser #Told when the status, address or history of the tab change
+        self.view = view.View(browser.root, width, height) #Every tab has its own canvas and layout
+        self.view.on_find = self.on_find
+        self.loader = loader.Loader(browser.root) #Fetches and parses pages in the worker processes
+        self.history = history.History(snapshot_budget) #Visited pages and the snapshots of the recent ones
+        self.shown_entry = None #The history entry of the page the view shows
+        self.pending = None #(entry, nodes) loaded while the tab was in the background
+        self.selected = False
+        self.status = '' #Shown in the header while the tab is selected
+        self.load_started = trace.TRACER.now() #When the last load started, the HUD only shows what happened after it
+
+    #The text of the tab button
+    def title(self):
+        entry = self.history.current()
+        if entry is None: return 'New tab'
+        return entry.url.host or entry.url.path.rsplit('/', 1)[-1] or str(entry.url)
+
+    #Opens a new page in the tab
+    def open(self, url):
+        self.save_snapshot()
+        self.load_entry(self.history.visit(url))
+
+    #Loads the page of the history entry in the background
+    def load_entry(self, entry):
+        self.load_started = trace.TRACER.now()
+        self.set_status('Loading...')
+        self.loader.load(entry.url, lambda nodes: self.on_load(entry, nodes), self.on_load_error)
+
+    #Called on the Tkinter thread when the page has been fetched and parsed
+    def on_load(self, entry, nodes):
+        self.set_status('')
+        if not self.selected:
+            self.pending = (entry, nodes) #Laid out when the tab gets selected
+            return
+        self.show(entry, nodes)
+
+    def show(self, entry, nodes):
+        self.pending = None
+        self.shown_entry = entry
+        self.view.scroll = entry.scroll #New pages start at the top, reloaded history entries where they were left
+        self.view.show(nodes, entry.url)
+
+    #Called on the Tkinter thread when the page couldn't be loaded
+    def on_load_error(self, error):
+        self.set_status('Failed to load: {}'.format(error))
+
+    #Called when the layout found more matches of find-in-page, the count is only shown for the selected tab
+    def on_find(self):
+        if self.selected:
+            self.browser.update_find_count()
+
+    #Keeps the page the view shows in the history so that going back to it is instant
+    def save_snapshot(self):
+        snapshot = self.view.snapshot()
+        if self.shown_entry is not None and snapshot is not None:
+            self.history.save(self.shown_entry, snapshot)
+
+    #Shows the entry from its snapshot, or loads it again if the snapshot was evicted
+    def navigate(self, entry):
+        self.loader.cancel()
+        self.pending = None
+        snapshot = self.history.restore(entry)
+        if snapshot is None:
+            self.load_entry(entry)
+            return
+        self.shown_entry = entry
+        self.view.restore(snapshot, entry.url)
+        self.set_status('')
+
+    def go_back(self):
+        if not self.history.can_go_back(): return
+        self.save_snapshot()
+        self.navigate(self.history.back())
+
+    def go_forward(self):
+        if not self.history.can_go_forward(): return
+        self.save_snapshot()
+        self.navigate(self.history.forward())
+
+    def set_status(self, text):
+        self.status = text
+        self.browser.update_tab(self)
+
+    #Shows the tab's view and lays out the page that was loaded while it was in the background
+    def select(self):
+        self.selected = True
+        self.view.attach()
+        if self.pending is not None:
+            self.show(*self.pending)
+
+    #Hides the tab's view, it stops rendering until selected again
+    def deselect(self):
+        self.selected = False
+        self.view.detach()
+
+    #Stops the loads and the pending callbacks of the tab, used when it's closed
+    def close(self):
+        self.loader.close()
+        self.view.destroy()
@@ -0,0 +1,124 @@
+#The trace file records how long the stages of a page load take
+#The timings can be read with summary() or exported as a Chrome trace for chrome://tracing or Perfetto
+#When tracing is off, span() returns a shared object that does nothing so the instrumentation costs almost nothing
+
+import collections
+import json
+import os
+import threading
+import time
+
+#A span that does nothing, returned when tracing is off
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+#Measures the time between entering and leaving the with block
+class Span:
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category #Used to group spans in the trace viewer (network, parse, layout, render)
+        self.args = args #Extra information shown with the span in the trace viewer
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.category, self.start, time.perf_counter(), self.args)
+        return False
+
+#Collects spans and counters
+class Tracer:
+    def __init__(self, max_events=100000):
+        self.enabled = False
+        self.max_events = max_events #Only the most recent spans are kept, tracing can stay on for a long time
+        self.events = collections.deque(maxlen=max_events) #Finished spans as (name, category, start, end, thread id, args)
+        self.counters = {} #Dictionary of counter name -> value
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter() #Timestamps in the export are relative to this
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self.lock:
+            self.events = collections.deque(maxlen=self.max_events)
+            self.counters = {}
+
+    def now(self):
+        return time.perf_counter()
+
+    #Get a context manager timing the with block: with TRACER.span('parse', 'parse'): ...
+    def span(self, name, category='browser', **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    #Add to a counter
+    def count(self, name, value=1):
+        if not self.enabled: return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name, category, start, end, args):
+        event = (name, category, start, end, threading.get_ident(), args)
+        with self.lock:
+            self.events.append(event)
+
+    #Adds spans and counters recorded by another process, like the parse workers
+    def merge(self, events, counters):
+        if not self.enabled: return
+        with self.lock:
+            self.events.extend(events)
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    #Total time and number of calls of every span, optionally only for spans started after since (a now() value)
+    def summary(self, since=None):
+        with self.lock:
+            events = list(self.events)
+        totals = {}
+        for name, category, start, end, thread, args in events:
+            if since is not None and start < since: continue
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + end - start)
+        return {name: {'count': count, 'ms': total * 1000} for name, (count, total) in totals.items()}
+
+    #The collected spans and counters in the Chrome trace event format
+    def to_chrome(self):
+        pid = os.getpid()
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        trace_events = []
+        last = self.origin
+        for name, category, start, end, thread, args in events:
+            trace_events.append({
+                'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread,
+                'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6, 'args': args
+            })
+            last = max(last, end)
+        if counters:
+            trace_events.append({
+                'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0,
+                'ts': (last - self.origin) * 1e6, 'args': counters
+            })
+        return {'traceEvents': trace_events, 'displayTimeUnit': 'ms'}
+
+    #Write the trace to a JSON file that can be opened in chrome://tracing or ui.perfetto.dev
+    def export(self, path):
+        with open(path, 'w', encoding='utf8') as file:
+            json.dump(self.to_chrome(), file)
+
+TRACER = Tracer() #The tracer shared by the whole browser
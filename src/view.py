@@ -1,7 +1,15 @@
 import tkinter as tk
 import tkinter.ttk as ttk
-import tkinter.font
+import bisect
+import time
 from . import htmlparser as htmlp
+from . import network as network
+from . import fonts as fonts
+from . import displaylist as displaylist
+from . import history as history
+from . import images as images
+from . import find as find
+from . import trace as trace
 
 #View represents the part of the GUI that manages rendering the website
 #It contains all the elements required for convinient and efficient web rendering like the scrollbar
@@ -10,33 +18,108 @@ class View:
         self.root = root #A Tkinter window to which a Tkinter canvas will be linked to
         self.width = width #The width of the view
         self.height = height #The height of the view
-        self.content = '' #The HTML content the view has to display
-        self.display_list = [] #List of text elements (words) and their position on screen and font (x, y, word, font)
+        self.display_list = displaylist.DisplayList(fonts.FONTS) #Display list of the words and images on screen, empty until a page is laid out
         self.HSTEP = 13 #The default horizontal distance between words
         self.VSTEP = 18 #The default vertical distance between lines
         self.scroll = 0 #The current scroll position (whcih part of the website is being viewd)
         self.SCROLL_STEP = 50 #The amount of pixels the page moves up or down as we scroll
         self.page_size = 0 #The vertical page size
         self.layout = None #Layout of words
+        self.nodes = None #The parsed tree of the page, kept so that relayouts don't parse again
+        self.resize_job = None #The pending relayout after a resize
+        self.RESIZE_DELAY = 50 #Milliseconds without resize events before relayouting
+        self.drawn = {} #Dictionary of display_list index -> canvas item of the words currently on the canvas
+        self.drawn_range = (0, 0) #The range of display_list indices currently on the canvas
+        self.drawn_scroll = 0 #The scroll position the canvas items are placed for
+        self.layout_job = None #The pending slice of an unfinished layout
+        self.LAYOUT_SLICE = 0.01 #Seconds of layout work done before giving the event loop back
+        self.url = None #The URL of the page, images are relative to it
+        self.image_urls = {} #Dictionary of src -> absolute URL (None if it can't be loaded) of the page's images
+        self.images = images.ImageLoader(root, self.image_loaded) #Loads the images near the view in the background
+        self.placeholders = {} #Dictionary of display_list index -> image key of the images drawn as an empty box until they load
+        self.shown_images = {} #Dictionary of image key -> PhotoImage drawn by this layout, Tk images evicted from the cache would go blank on the canvas
+        self.query = '' #The text searched with find-in-page
+        self.search_index = None #The find-in-page index of the current layout, built on the first search
+        self.matches = [] #The (first, last) display_list indices of the words of every match, in page order
+        self.match = -1 #The index in matches of the current match
+        self.on_find = None #Called when the matches change without a search, as the layout adds words
 
-    #Loads the view content
-    def load(self):
-        #if content is loaded (don't execute when browser first opened)
-        if self.content:
-            parser = htmlp.HTMLParser(self.content) #The HTML parser used to read from
-            self.nodes = parser.parse() #Stores the root node
-            self.layout = Layout(self.nodes, self.width, self.height) #Creates the layout based on the root node of the parser and dimentions of the view
-            self.display_list = self.layout.display_list
-            self.page_size = self.layout.page_size
-            self.render() #Renders the content
-
-    #On resize, rerender the page
+    #Lays out and renders an already parsed tree, url is where the page comes from
+    def show(self, nodes, url=None):
+        self.nodes = nodes #Stores the root node
+        self.set_url(url)
+        self.relayout()
+
+    def set_url(self, url):
+        if url is not self.url:
+            self.url = url
+            self.image_urls = {}
+
+    #Everything needed to show the current page again later, None if nothing is shown
+    def snapshot(self):
+        if self.nodes is None: return None
+        return history.Snapshot(self.nodes, self.layout, self.scroll, self.width)
+
+    #Shows a page from a snapshot, the layout is reused if the width didn't change
+    def restore(self, snapshot, url=None):
+        self.nodes = snapshot.nodes
+        self.set_url(url)
+        self.scroll = snapshot.scroll
+        if snapshot.layout is None or snapshot.width != self.width:
+            self.relayout()
+            return
+        if self.layout_job is not None:
+            self.root.after_cancel(self.layout_job)
+            self.layout_job = None
+        self.layout = snapshot.layout
+        self.display_list = self.layout.display_list
+        self.reset_find()
+        self.clear()
+        self.layout_slice() #Finishes the layout if the snapshot was taken before it was done, otherwise just renders
+
+    #Lays out the stored tree for the current width and renders it
+    #The layout is done in time slices so the first screen is painted before the whole page is laid out
+    def relayout(self):
+        if self.layout_job is not None:
+            self.root.after_cancel(self.layout_job)
+            self.layout_job = None
+        self.layout = Layout(self.nodes, self.width, self.height, sliced=True) #Creates the layout based on the root node of the parser and dimentions of the view
+        self.display_list = self.layout.display_list
+        self.reset_find()
+        self.clear()
+        self.layout_slice()
+
+    #Runs one slice of the layout, paints what's been laid out and schedules the next slice
+    def layout_slice(self):
+        self.layout_job = None
+        done = self.layout.run(time.perf_counter() + self.LAYOUT_SLICE)
+        self.page_size = self.layout.page_size
+        if done:
+            self.scroll = max(0, min(self.scroll, self.page_size - self.height))
+        else:
+            self.layout_job = self.root.after(1, self.layout_slice)
+        if self.query:
+            self.update_find() #Matches in the words of this slice, or of the new layout if the old matches were dropped
+        self.render() #Renders the content, the scrollbar grows with the page
+
+    #On resize, wait for the resizing to settle before rerendering the page
     def resize(self, event):
-        self.height = event.height
-        self.width = event.width
-        if self.page_size - self.height <= self.scroll:
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(self.RESIZE_DELAY, lambda: self.apply_resize(event.width, event.height))
+
+    #Only the width changes line breaks, so a height change only needs a render
+    def apply_resize(self, width, height):
+        self.resize_job = None
+        width_changed = width != self.width
+        self.width = width
+        self.height = height
+        if self.nodes is None: return
+        if width_changed:
+            self.relayout()
+        else:
             self.scroll = max(0, min(self.scroll, self.page_size - self.height))
-        self.load()
+            self.render()
 
     #Scrollbar logic !!!See how PySide implements it
     def scrolldown(self, event):
@@ -82,6 +165,7 @@ class View:
     def create_view(self):
         container = tk.Frame(self.root)
         container.pack(fill='both', expand=True)
+        self.container = container
 
         self.canvas = tk.Canvas(container)
         self.canvas.configure(background='white')
@@ -97,21 +181,214 @@ class View:
         self.scrollbar.pack(side='right', fill='y', padx=(0, 2), pady=5)
         self.scrollbar.set(0, 0)
 
-    #Renders the content on the canvas by iterating the display_list
+    #Shows the view again after detach()
+    def attach(self):
+        self.container.pack(fill='both', expand=True)
+        if self.layout is not None and not self.layout.done:
+            self.layout_slice()
+
+    #Hides the view, used for background tabs
+    def detach(self):
+        if self.layout_job is not None: #The layout is finished when the view is shown again
+            self.root.after_cancel(self.layout_job)
+            self.layout_job = None
+        self.container.pack_forget()
+
+    #Cancels every pending callback of the view before destroying its canvas, they would draw on a destroyed widget
+    def destroy(self):
+        self.detach()
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+            self.resize_job = None
+        self.images.close()
+        self.container.destroy()
+
+    #Removes every word from the canvas, used when the display_list changes
+    def clear(self):
+        self.canvas.delete('page')
+        self.canvas.delete('highlight')
+        self.images.cancel() #The images of the old layout that didn't start loading aren't needed anymore
+        self.placeholders = {}
+        self.shown_images = {}
+        self.drawn = {}
+        self.drawn_range = (0, 0)
+        self.drawn_scroll = self.scroll
+
+    #Finds the range of display_list indices on screen by bisecting the lines of the layout
+    #margin is how far above and below the view lines are still counted as visible, VSTEP by default
+    def visible_range(self, margin=None):
+        if self.layout is None: return 0, 0
+        if margin is None: margin = self.VSTEP
+        display_list = self.display_list
+        first = bisect.bisect_left(display_list.line_bottoms, self.scroll - margin) #The first line that ends below the top of the view
+        last = bisect.bisect_right(display_list.line_tops, self.scroll + self.height + margin) #The lines that start above the bottom of the view
+        if first >= last: return 0, 0
+        start = display_list.line_starts[first]
+        end = display_list.line_starts[last] if last < len(display_list.line_starts) else len(display_list)
+        return start, end
+
+    #Renders the content on the canvas, words already on the canvas are moved and only the words entering the view are created
     def render(self):
-        self.canvas.delete('all')
-        self.update_scrollbar()
-        for x, y, c, font in self.display_list:
-            if y > self.scroll + self.height: continue
-            if y + self.VSTEP < self.scroll: continue
-            self.canvas.create_text(x, y - self.scroll, text=c, anchor='nw', font=font) #Anchor the text rendering on the top-left side
+        with trace.TRACER.span('render', 'render'):
+            self.update_scrollbar()
+            start, end = self.visible_range()
+            dy = self.drawn_scroll - self.scroll
+            if dy:
+                self.canvas.move('page', 0, dy)
+                self.drawn_scroll = self.scroll
+            #Delete the words that left the view
+            drawn_start, drawn_end = self.drawn_range
+            for i in range(drawn_start, drawn_end):
+                if i < start or i >= end:
+                    self.canvas.delete(self.drawn.pop(i))
+                    self.placeholders.pop(i, None)
+            #Create the words that entered the view
+            for i, (x, y, c, font) in enumerate(self.display_list.entries(start, end), start):
+                if i not in self.drawn:
+                    if font is None:
+                        self.drawn[i] = self.draw_image(i, x, y - self.scroll, c)
+                    else:
+                        self.drawn[i] = self.canvas.create_text(x, y - self.scroll, text=c, anchor='nw', font=font, tags='page') #Anchor the text rendering on the top-left side
+            self.drawn_range = (start, end)
+            self.draw_highlights(start, end)
+            #Start loading the images up to a screen away, so they're often ready before being scrolled to
+            near_start, near_end = self.visible_range(self.height)
+            for i in self.display_list.images_in(near_start, near_end):
+                key = self.image_key(i)
+                if key is not None:
+                    self.images.request(*key)
+
+    #Searches the page and jumps to the first match from the top of the view, returns the number of matches
+    #The index is built on the first search of a layout, later searches (like every key typed) only use it
+    def find(self, query, jump=True):
+        self.query = query
+        if self.layout is None: return 0
+        self.search()
+        self.match = self.first_visible_match()
+        if jump and self.matches:
+            self.show_match()
+        else:
+            self.render()
+        return len(self.matches)
+
+    #Finds the matches of the query in the words laid out so far
+    def search(self):
+        if self.search_index is None:
+            self.search_index = find.SearchIndex(self.display_list)
+        with trace.TRACER.span('find', 'find', query=self.query):
+            self.search_index.update() #Adds the words laid out since the last search
+            self.matches = self.search_index.search(self.query)
+
+    #The index of the first match from the top of the view, or -1 without matches
+    def first_visible_match(self):
+        if not self.matches: return -1
+        match = bisect.bisect_left(self.matches, (self.visible_range(0)[0],))
+        return match if match < len(self.matches) else 0 #Nothing below, wrap to the first
+
+    #Adds the matches in the words the layout added since the last search, the current match stays the current one
+    def update_find(self):
+        if self.search_index is None: #A new layout, the old matches were dropped
+            self.search()
+            self.match = self.first_visible_match()
+        else:
+            if self.search_index.indexed == len(self.display_list): return
+            with trace.TRACER.span('find', 'find', query=self.query):
+                matches = self.search_index.update()
+            if not matches: return
+            self.matches.extend(matches) #New words are after every earlier match
+            if self.match < 0:
+                self.match = self.first_visible_match()
+        if self.on_find is not None:
+            self.on_find()
+
+    #Goes to the next match, or the previous one with step=-1
+    def find_next(self, step=1):
+        if not self.matches: return
+        self.match = (self.match + step) % len(self.matches)
+        self.show_match()
+
+    #Scrolls so the current match is in the view, the view only moves if it isn't already
+    def show_match(self):
+        y = self.display_list.ys[self.matches[self.match][0]]
+        if y < self.scroll or y + self.VSTEP > self.scroll + self.height:
+            self.scroll = max(0, min(y - self.height / 3, self.page_size - self.height))
+        self.render()
+
+    #Stops find-in-page, the highlights are removed
+    def clear_find(self):
+        self.query = ''
+        self.reset_find()
+        self.canvas.delete('highlight')
+
+    #The matches belong to a display list, a new layout needs a new index
+    def reset_find(self):
+        self.search_index = None
+        self.matches = []
+        self.match = -1
+
+    #Draws rectangles behind the words of the matches in the range of display_list indices, the current match is orange
+    def draw_highlights(self, start, end):
+        self.canvas.delete('highlight')
+        if not self.matches: return
+        fonts = self.layout.fonts
+        display_list = self.display_list
+        for m in range(bisect.bisect_left(self.matches, (start,)), len(self.matches)):
+            first, last = self.matches[m]
+            if first >= end: break
+            color = 'orange' if m == self.match else 'yellow'
+            for i in range(first, min(last + 1, end)):
+                font_id = display_list.font_ids[i]
+                if font_id == displaylist.IMAGE: continue
+                key = fonts.font_keys[font_id]
+                metrics = fonts.get_metrics(*key)
+                x, y = display_list.xs[i], display_list.ys[i] - self.scroll
+                width = fonts.measure(*key, display_list.words[display_list.word_ids[i]])
+                item = self.canvas.create_rectangle(x, y, x + width, y + metrics['ascent'] + metrics['descent'],
+                                                    fill=color, outline='', tags='highlight')
+                self.canvas.tag_lower(item) #Behind the text
+
+    #Get the (url, width, height) key of the image at the display_list index, None if its URL can't be loaded
+    def image_key(self, i):
+        src = self.display_list.words[self.display_list.word_ids[i]]
+        if src not in self.image_urls:
+            try:
+                self.image_urls[src] = str(self.url.resolve(src) if self.url is not None else network.URL(src))
+            except (ValueError, AssertionError): #Unsupported schemes like data:
+                self.image_urls[src] = None
+        url = self.image_urls[src]
+        if url is None: return None
+        width, height = self.display_list.image_sizes[i]
+        return (url, width, height)
+
+    #Draws the image if it's decoded, otherwise an empty box that gets replaced once it's loaded
+    def draw_image(self, i, x, y, src):
+        key = self.image_key(i)
+        image = self.shown_images.get(key) or (images.IMAGES.get(key) if key is not None else None)
+        if image is not None:
+            self.shown_images[key] = image
+            return self.canvas.create_image(x, y, image=image, anchor='nw', tags='page')
+        width, height = self.display_list.image_sizes[i]
+        if key is not None:
+            self.placeholders[i] = key
+        return self.canvas.create_rectangle(x, y, x + width, y + height, outline='#cccccc', tags='page')
+
+    #Called on the Tkinter thread when an image got decoded, its empty boxes on the canvas are replaced
+    def image_loaded(self, key):
+        replaced = [i for i, placeholder in self.placeholders.items() if placeholder == key]
+        for i in replaced:
+            del self.placeholders[i]
+            self.canvas.delete(self.drawn.pop(i))
+        if replaced:
+            self.render()
 
 #Represents the layout of words on screen
+#The layout walks the tree iteratively, so it can be paused between nodes and deep trees don't hit the recursion limit
 class Layout:
-    def __init__(self, nodes, width, height):
-        self.display_list = []
-        self.line = [] #Array of words in a line and their horizontal position, font and vertical placement (x, word, font, placement)
-        self.fonts = {} #A dictionary of fotns to use for caching
+    def __init__(self, nodes, width, height, font_cache=None, sliced=False):
+        self.fonts = font_cache if font_cache is not None else fonts.FONTS #Fonts and measurements shared with other layouts
+        self.display_list = displaylist.DisplayList(self.fonts)
+        self.line = [] #Array of words in a line and their horizontal position, font id, vertical placement and font metrics (x, word, font_id, placement, metrics)
+        self.page_size = 0 #The vertical page size
         self.width = width
         self.height = height
         self.HSTEP = 13
@@ -123,99 +400,156 @@ class Layout:
         self.align = 'left'
         self.placement = 0 #Represents individaul y positions within a line for words
         self.size = 12 #Font size
-        self.recurse(nodes) #Generate the parse tree for HTML
-        if self.display_list: #Get the vertical page size
-            a, self.page_size, b, c = self.display_list[-1]
-
-    #Manages font caching
-    def get_font(self, size, weight, style):
-        key = (size, weight, style)
-        if key not in self.fonts:
-            font = tkinter.font.Font(size=size, weight=weight, slant=style)
-            label = tkinter.Label(font=font)
-            self.fonts[key] = (font, label)
-        return self.fonts[key][0]
+        self.stack = [(nodes, False)] #Nodes left to visit, with whether the visit is the closing of the tag
+        self.done = False #Whether the whole tree has been laid out
+        self.SLICE_CHECK = 64 #The number of nodes between checks of the deadline
+        self.states = [] #The size, weight, style and align to restore when the open elements close
+        self.HIDDEN_TAGS = frozenset(['style', 'script']) #Elements whose content isn't displayed
+        self.IMAGE_SIZE = (300, 150) #The box of images without width and height, like the CSS default for replaced elements
+        if not sliced:
+            self.run() #Generate the display list for the whole tree
 
     #For each line, determine the layout of each word and move to next line and store it in display_list
-    def flush(self, align = 'left'):
+    def flush(self, align=None):
         if not self.line: return #If line emtpy, return
-        metrics = [font.metrics() for x, word, font, placement in self.line] #Get the metrics (y size) of the font
-        max_ascent = max([metric['ascent'] for metric in metrics]) #Find the max ascent of a line
-        baseline = self.cursor_y + 1.25 * max_ascent #Based on max ascent, find the baseline
-        line_center = sum(x[0] for x in self.line) / 2 #Find the center of the line for center alignment
-        #Fill the display_list
-        for x, word, font, placement in self.line:
-            y = baseline - font.metrics('ascent') - placement
-            if align == 'center' : x += self.width / 2 - line_center / 2 
-            self.display_list.append((x, y, word, font))
-        max_descent = max([metric['descent'] for metric in metrics]) #Find the max descent
-        self.cursor_y = baseline + 1.25 * max_descent #Move the y cursor below the max descent
-        self.cursor_x = self.HSTEP #Reset the x cursor
-        self.line = [] #Reset the line
+        align = align or self.align
+        with trace.TRACER.span('flush', 'layout', words=len(self.line)):
+            metrics = [metric for x, word, font_id, placement, metric in self.line] #Get the metrics (y size) of the font
+            max_ascent = max([metric['ascent'] for metric in metrics]) #Find the max ascent of a line
+            baseline = self.cursor_y + 1.25 * max_ascent #Based on max ascent, find the baseline
+            line_center = sum(x[0] for x in self.line) / 2 #Find the center of the line for center alignment
+            self.display_list.start_line(self.cursor_y)
+            #Fill the display_list
+            for x, word, font_id, placement, metric in self.line:
+                if align == 'center' : x += self.width / 2 - line_center / 2 
+                elif align == 'right': x += self.width - self.HSTEP - self.cursor_x
+                if font_id == displaylist.IMAGE: #Images sit on the baseline
+                    self.display_list.append_image(x, baseline - metric['height'] - placement, word, metric['width'], metric['height'])
+                else:
+                    self.display_list.append(x, baseline - metric['ascent'] - placement, word, font_id)
+            max_descent = max([metric['descent'] for metric in metrics]) #Find the max descent
+            self.cursor_y = baseline + 1.25 * max_descent #Move the y cursor below the max descent
+            self.display_list.end_line(self.cursor_y)
+            self.cursor_x = self.HSTEP #Reset the x cursor
+            self.line = [] #Reset the line
 
     #Appends fords to the line array
     def word(self, word):
-        font = self.get_font(self.size, self.weight, self.style)
-        w = font.measure(word) #Find the width of words based on font
+        font_id = self.fonts.get_font_id(self.size, self.weight, self.style)
+        w = self.fonts.measure(self.size, self.weight, self.style, word) #Find the width of words based on font
         if self.cursor_x + w > self.width - self.HSTEP: #If word at end of line, flush it !!!(here add for soft hyphens)
             self.flush()
-        self.line.append((self.cursor_x, word, font, self.placement))
-        self.cursor_x += w + font.measure(' ') #Move cursor to the right
+        metrics = self.fonts.get_metrics(self.size, self.weight, self.style)
+        self.line.append((self.cursor_x, word, font_id, self.placement, metrics))
+        self.cursor_x += w + self.fonts.measure(self.size, self.weight, self.style, ' ') #Move cursor to the right
+
+    #Reserves the box of an image in the line, the image is drawn in it once loaded
+    def image(self, node):
+        src = node.attributes.get('src')
+        if not src: return
+        width, height = self.image_box(node)
+        if self.cursor_x + width > self.width - self.HSTEP:
+            self.flush()
+        #The ascent makes the line as tall as the image, like the 1.25 line height of words
+        metrics = {'ascent': height / 1.25, 'descent': 0, 'width': width, 'height': height}
+        self.line.append((self.cursor_x, src, displaylist.IMAGE, self.placement, metrics))
+        self.cursor_x += width + self.fonts.measure(self.size, self.weight, self.style, ' ')
+
+    #Get the size of an image box from its width and height attributes, it's shrunk to fit the page width
+    def image_box(self, node):
+        width = self.image_dimension(node, 'width')
+        height = self.image_dimension(node, 'height')
+        if width is None and height is None:
+            width, height = self.IMAGE_SIZE
+        elif width is None:
+            width = height
+        elif height is None:
+            height = width
+        max_width = max(1, self.width - 2 * self.HSTEP)
+        if width > max_width:
+            height = max(1, round(height * max_width / width))
+            width = max_width
+        return width, height
+
+    def image_dimension(self, node, name):
+        value = node.attributes.get(name, '').strip().removesuffix('px')
+        return int(value) if value.isdigit() and int(value) > 0 else None
+
+    #Applies the computed style of an element, the state before it is kept to be restored when it closes
+    def push_style(self, node):
+        self.states.append((self.size, self.weight, self.style, self.align))
+        style = node.style
+        if style is None: return #The tree wasn't styled
+        if style.align != self.align:
+            self.flush() #The line before the element keeps its own alignment
+        self.size, self.weight, self.style, self.align = style.values()
+
+    #Restores the state from before the element
+    def pop_style(self):
+        size, weight, style, align = self.states.pop()
+        if align != self.align:
+            self.flush() #The last line of the element keeps the element's alignment
+        self.size, self.weight, self.style, self.align = size, weight, style, align
 
     #For soem open HTML tag, perform action
     def open_tag(self, tag):
-        if tag == 'i':
-            self.style = 'italic'
-        elif tag == 'b':
-            self.style = 'bold'
-        elif tag == 'small':
-            self.size -= 2
-        elif tag == 'big':
-            self.size += 4
-        elif tag == 'br':
+        if tag == 'br':
             self.flush()
-        elif tag == 'h1':
-            self.align = 'center'
-            self.size += 5
         elif tag == 'sup':
             self.size = round(self.size / 2) # !!!Change later so that the resize works for odd numbers too
             self.placement += self.size
 
     #For some closing HTML tag, perform some action
     def close_tag(self, tag):
-        if tag == 'i':
-            self.style = 'roman'
-        elif tag == 'b':
-            self.weight = 'normal'
-        elif tag == 'small':
-            self.size += 2
-        elif tag == 'big':
-            self.size -= 4
-        elif tag == 'br':
+        if tag == 'br':
             self.flush()
         elif tag == 'p':
             self.flush()
             self.cursor_y += self.VSTEP
-        elif tag == 'h1':
-            self.flush(align=self.align)
-            if self.align == 'center' : self.size -= 5
-            self.align = 'left'
+        elif tag in ('h1', 'h2', 'h3', 'h4', 'h5', 'h6'):
+            self.flush()
         elif tag == 'title':
             self.flush()
         elif tag == 'sup':
             self.placement -= self.size
             self.size *= 2
 
-    #Recursively traverse the tree to fill the display_list for rendering
-    def recurse(self, tree):
-        if isinstance(tree, htmlp.Text):
-            for word in tree.text.split():
-                self.word(word)
-        else:
-            self.open_tag(tree.tag)
-            for child in tree.children:
-                self.recurse(child)
-            self.close_tag(tree.tag)
-  
-        
-        
\ No newline at end of file
+    #Traverse the tree to fill the display_list for rendering
+    #Stops when the deadline (a time.perf_counter() value) is passed and returns whether the layout is done, calling it again resumes
+    def run(self, deadline=None):
+        with trace.TRACER.span('layout', 'layout', width=self.width):
+            return self.run_slice(deadline)
+
+    #The traversal itself, run() only wraps it in a trace span
+    def run_slice(self, deadline):
+        stack = self.stack
+        count = 0
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                self.close_tag(node.tag)
+                self.pop_style()
+            elif isinstance(node, htmlp.Text):
+                for word in node.text.split():
+                    self.word(word)
+            elif node.tag not in self.HIDDEN_TAGS:
+                self.push_style(node)
+                self.open_tag(node.tag)
+                if node.tag == 'img': self.image(node)
+                stack.append((node, True))
+                for child in reversed(node.children):
+                    stack.append((child, False))
+            count += 1
+            if deadline is not None and count % self.SLICE_CHECK == 0 and time.perf_counter() >= deadline:
+                self.update_page_size()
+                return False
+        if not self.done:
+            self.flush() #The last line isn't always finished by a closing tag
+            self.done = True
+        self.update_page_size()
+        return True
+
+    #Get the vertical page size, the bottom of the last line so a tall image at the end can be scrolled to
+    def update_page_size(self):
+        if self.display_list.line_bottoms:
+            self.page_size = self.display_list.line_bottoms[-1]
@@ -0,0 +1,94 @@
+#Tests of the --batch mode against a local http.server
+
+import gzip
+import http.server
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import unittest
+from src import batch as batch
+
+BODY = ('<html><body>' + '<p>héllo <b>wörld</b></p>' * 500 + '</body></html>').encode('utf8')
+
+#Serves BODY plainly, gzipped or chunked, and 404 for /missing
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(BODY), 1000):
+                chunk = BODY[i:i + 1000]
+                self.wfile.write(b'%x\r\n' % len(chunk) + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        status, body, encoding = 200, BODY, None
+        if self.path == '/gzip':
+            body, encoding = gzip.compress(BODY), 'gzip'
+        elif self.path == '/missing':
+            status, body = 404, b'<p>Not found</p>'
+        self.send_response(status)
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    #Writes the batch file and runs it, returns the exit status and the records by URL
+    def run_batch(self, urls):
+        batch_file = os.path.join(self.directory.name, 'urls.txt')
+        output = os.path.join(self.directory.name, 'out.jsonl')
+        with open(batch_file, 'w', encoding='utf8') as file:
+            file.write('# comment\n\n' + '\n'.join(urls) + '\n')
+        status = batch.main(batch_file, concurrency=2, output=output, timeout=10.0)
+        with open(output, encoding='utf8') as file:
+            records = [json.loads(line) for line in file]
+        return status, {record['url']: record for record in records}
+
+    def test_records(self):
+        base = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        urls = [base + '/', base + '/gzip', base + '/chunked', base + '/missing']
+        status, records = self.run_batch(urls)
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(records), sorted(urls))
+        nodes = records[base + '/']['nodes']
+        self.assertGreater(nodes, 1000)
+        for url in urls[:3]:
+            record = records[url]
+            self.assertEqual(record['status'], 200)
+            self.assertIsNone(record['error'])
+            self.assertEqual(record['nodes'], nodes) #Every framing and encoding gives the same tree
+        self.assertEqual(records[base + '/missing']['status'], 404)
+        self.assertEqual(sorted(record['index'] for record in records.values()), [0, 1, 2, 3])
+
+    def test_errors_reported(self):
+        base = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        status, records = self.run_batch([base + '/', 'ftp://example.com/', 'http://127.0.0.1:1/'])
+        self.assertEqual(status, 1)
+        self.assertIsNone(records[base + '/']['error'])
+        self.assertIsNotNone(records['ftp://example.com/']['error'])
+        self.assertIsNotNone(records['http://127.0.0.1:1/']['error'])
+
+if __name__ == '__main__':
+    unittest.main()
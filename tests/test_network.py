@@ -0,0 +1,93 @@
+#Tests of the HTTP client against a local http.server: body framings, content encodings and connection reuse
+#Run from the repository root with: python -m unittest discover tests
+
+import gzip
+import http.server
+import socketserver
+import threading
+import unittest
+import zlib
+from src import network as network
+
+BODY = ('<html><body><p>' + 'héllo wörld ' * 5000 + '</p></body></html>').encode('utf8')
+
+#Serves BODY with a different framing or encoding on every path and counts the connections it accepted
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' #Keep-alive by default
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/chunked':
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(BODY), 777): #Chunks that split the multi-byte characters
+                chunk = BODY[i:i + 777]
+                self.wfile.write(b'%x\r\n' % len(chunk) + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+            return
+        body, encoding = BODY, None
+        if self.path == '/gzip':
+            body, encoding = gzip.compress(BODY), 'gzip'
+        elif self.path == '/deflate':
+            body, encoding = zlib.compress(BODY), 'deflate'
+        self.send_response(200)
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == '/drop':
+            self.close_connection = True #Closes without telling the client, like a server dropping idle connections
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class NetworkTest(unittest.TestCase):
+    def setUp(self):
+        Handler.connections = 0
+        self.server = Server(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.pool = network.ConnectionPool()
+
+    def tearDown(self):
+        self.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    #Loads the path with a pool of the test and without the response cache
+    def load(self, path):
+        url = network.URL('http://127.0.0.1:{}{}'.format(self.server.server_address[1], path))
+        return network.Socket(url, pool=self.pool, cache=None, resolver=network.Resolver()).load_content()
+
+    def test_plain(self):
+        self.assertEqual(self.load('/'), BODY.decode('utf8'))
+
+    def test_gzip(self):
+        self.assertEqual(self.load('/gzip'), BODY.decode('utf8'))
+
+    def test_deflate(self):
+        self.assertEqual(self.load('/deflate'), BODY.decode('utf8'))
+
+    def test_chunked(self):
+        self.assertEqual(self.load('/chunked'), BODY.decode('utf8'))
+
+    def test_connection_reused(self):
+        for path in ['/', '/gzip', '/chunked', '/deflate', '/']:
+            self.assertEqual(self.load(path), BODY.decode('utf8'))
+        self.assertEqual(Handler.connections, 1)
+
+    def test_stale_connection_retried(self):
+        self.assertEqual(self.load('/drop'), BODY.decode('utf8'))
+        self.assertEqual(self.load('/'), BODY.decode('utf8')) #The pooled connection was closed by the server
+        self.assertEqual(Handler.connections, 2)
+
+if __name__ == '__main__':
+    unittest.main()
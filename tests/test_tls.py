@@ -0,0 +1,57 @@
+#Tests of TLS session resumption against a local HTTPS http.server
+#localhost.pem is a self-signed certificate and key for localhost, only used by these tests
+
+import http.server
+import os
+import socketserver
+import ssl
+import threading
+import unittest
+from src import network as network
+
+CERTIFICATE = os.path.join(os.path.dirname(__file__), 'localhost.pem')
+
+#Answers every request and closes the connection, so every load needs a new handshake
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b'<p>secure</p>'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class TLSTest(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(CERTIFICATE)
+        self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tls = network.TLSSessions(ssl.create_default_context(cafile=CERTIFICATE))
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def load(self):
+        url = network.URL('https://localhost:{}/'.format(self.server.server_address[1]))
+        socket = network.Socket(url, pool=network.ConnectionPool(), cache=None, resolver=network.Resolver(), tls=self.tls)
+        return socket.load_content()
+
+    def test_session_resumed(self):
+        for _ in range(3):
+            self.assertEqual(self.load(), '<p>secure</p>')
+        self.assertEqual(self.tls.full, 1) #Only the first load does a full handshake
+        self.assertEqual(self.tls.resumed, 2)
+
+if __name__ == '__main__':
+    unittest.main()